@@ -0,0 +1,172 @@
+"""Contact analytics served from per-day, per-service rollups.
+
+Every stored contact message increments a ``contact_rollups`` document keyed
+by tenant, UTC day and service type, so dashboards aggregate a few documents
+per day instead of every message. Each rollup also tallies its messages by
+status and GHL sync status; a status change moves one count between tallies.
+Estimated value is computed at read time from SERVICE_VALUES, so changing a
+value needs no recount.
+``rebuild_rollups`` recounts from contact_messages after a missed increment;
+run it while ingestion is quiet with ``python analytics.py [tenant_id]`` or
+POST /api/admin/analytics/contacts/rebuild.
+"""
+import asyncio
+import logging
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from database import (
+    close_client, contact_messages_collection, contact_rollups_collection, DEFAULT_TENANT, ROLLUP_TALLIES, tenant_filter,
+)
+from ghl_integration import SERVICE_VALUES, DEFAULT_SERVICE_VALUE
+from instrumentation import timed_db
+
+# $dateToString formats per time bucket; ISO weeks start on Monday
+BUCKET_FORMATS = {"day": "%Y-%m-%d", "week": "%G-W%V", "month": "%Y-%m"}
+
+
+def service_value_expression(service_type: str = "$service_type") -> Dict[str, Any]:
+    """Aggregation expression for the estimated opportunity value of a service type"""
+    return {"$switch": {
+        "branches": [{"case": {"$eq": [service_type, name]}, "then": value} for name, value in SERVICE_VALUES.items()],
+        "default": DEFAULT_SERVICE_VALUE,
+    }}
+
+
+def tally_facet(tally: str) -> List[Dict[str, Any]]:
+    """Sum one status tally across rollups into {_id: status, count}"""
+    return [
+        {"$project": {"tally": {"$objectToArray": {"$ifNull": [f"${tally}", {}]}}}},
+        {"$unwind": "$tally"},
+        {"$group": {"_id": "$tally.k", "count": {"$sum": "$tally.v"}}},
+        {"$match": {"count": {"$ne": 0}}},
+        {"$sort": {"_id": 1}},
+    ]
+
+
+def rollup_pipeline(tenant_id: str, start: datetime, end: datetime, bucket: str) -> List[Dict[str, Any]]:
+    """Totals, per-service, per-bucket and per-status counts and values in one round trip"""
+    count_and_value = {"count": {"$sum": "$count"}, "value": {"$sum": "$value"}}
+    return [
+        {"$match": tenant_filter(tenant_id, {"day": {"$gte": start, "$lt": end}})},
+        {"$addFields": {"value": {"$multiply": ["$count", service_value_expression()]}}},
+        {"$facet": {
+            "totals": [{"$group": {"_id": None, **count_and_value}}],
+            "by_service": [
+                {"$group": {"_id": "$service_type", **count_and_value}},
+                {"$sort": {"count": -1, "_id": 1}},
+            ],
+            "series": [
+                {"$group": {"_id": {"$dateToString": {"format": BUCKET_FORMATS[bucket], "date": "$day"}},
+                            **count_and_value}},
+                {"$sort": {"_id": 1}},
+            ],
+            "by_status": tally_facet(ROLLUP_TALLIES["status"]),
+            "by_sync_status": tally_facet(ROLLUP_TALLIES["ghl_sync_status"]),
+        }},
+    ]
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """``value`` as a naive UTC datetime, the way Mongo stores them; naive values are taken as UTC"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def day_range(start: Optional[datetime], end: Optional[datetime], days: int = 30):
+    """Whole UTC days covering [start, end); a partial last day is included. Defaults to the last ``days`` days"""
+    start, end = naive_utc(start), naive_utc(end)
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    if end is None:
+        end = today + timedelta(days=1)
+    elif end.time() != datetime.min.time():
+        # Round up, so a range inside one day still covers that day
+        end = end.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    start = (start or end - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return start, end
+
+
+@timed_db
+async def contact_analytics(tenant_id: str = DEFAULT_TENANT, start: Optional[datetime] = None,
+                            end: Optional[datetime] = None, bucket: str = "day") -> Dict[str, Any]:
+    """Lead volume and estimated value for a tenant over whole days"""
+    start, end = day_range(start, end)
+    rollups = await contact_rollups_collection.aggregate(rollup_pipeline(tenant_id, start, end, bucket)).to_list(1)
+    facets = rollups[0] if rollups else {}
+    totals = (facets.get("totals") or [{}])[0]
+    return {
+        "start": start,
+        "end": end,
+        "bucket": bucket,
+        "total": {"count": totals.get("count", 0), "value": totals.get("value", 0)},
+        "by_service": [
+            {"service_type": row["_id"], "count": row["count"], "value": row["value"]}
+            for row in facets.get("by_service", [])
+        ],
+        "series": [
+            {"bucket": row["_id"], "count": row["count"], "value": row["value"]}
+            for row in facets.get("series", [])
+        ],
+        "by_status": {row["_id"]: row["count"] for row in facets.get("by_status", [])},
+        "by_sync_status": {row["_id"]: row["count"] for row in facets.get("by_sync_status", [])},
+    }
+
+
+@timed_db
+async def rebuild_rollups(tenant_id: Optional[str] = None) -> int:
+    """Recount rollups from contact_messages for one tenant (or all); returns the rollup count.
+
+    Messages stored while this runs may be counted twice or not at all on
+    the days being rebuilt; run it when ingestion is quiet.
+    """
+    started = datetime.utcnow()
+    scope = tenant_filter(tenant_id) if tenant_id else {}
+    key = {
+        "tenant_id": {"$ifNull": ["$tenant_id", DEFAULT_TENANT]},
+        "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+        "service_type": "$service_type",
+    }
+    rollup_id = {"$concat": ["$_id.tenant_id", "|", "$_id.day", "|", "$_id.service_type"]}
+    await contact_messages_collection.aggregate([
+        {"$match": scope},
+        {"$group": {"_id": key, "count": {"$sum": 1}}},
+        {"$project": {
+            "_id": rollup_id,
+            "tenant_id": "$_id.tenant_id",
+            "day": {"$dateFromString": {"dateString": "$_id.day", "format": "%Y-%m-%d"}},
+            "service_type": "$_id.service_type",
+            "count": 1,
+            **{tally: {"$literal": {}} for tally in ROLLUP_TALLIES.values()},
+            "updated_at": {"$literal": started},
+        }},
+        {"$merge": {"into": "contact_rollups", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]).to_list(None)
+    # One more pass per tally, merged into the rollups written above
+    for field, tally in ROLLUP_TALLIES.items():
+        await contact_messages_collection.aggregate([
+            {"$match": scope},
+            {"$group": {"_id": {**key, "value": {"$ifNull": [f"${field}", "unknown"]}}, "count": {"$sum": 1}}},
+            {"$group": {
+                "_id": {"tenant_id": "$_id.tenant_id", "day": "$_id.day", "service_type": "$_id.service_type"},
+                "tally": {"$push": {"k": "$_id.value", "v": "$count"}},
+            }},
+            {"$project": {"_id": rollup_id, tally: {"$arrayToObject": "$tally"}}},
+            {"$merge": {"into": "contact_rollups", "whenMatched": "merge", "whenNotMatched": "discard"}},
+        ]).to_list(None)
+    # Rollups the recount did not touch have no messages left behind them
+    await contact_rollups_collection.delete_many({**scope, "updated_at": {"$lt": started}})
+    return await contact_rollups_collection.count_documents(scope)
+
+
+async def main(tenant_id: Optional[str] = None):
+    try:
+        print(f"Rebuilt {await rebuild_rollups(tenant_id)} contact rollups")
+    finally:
+        close_client()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else None))
@@ -0,0 +1,22 @@
+import hmac
+import os
+
+from fastapi import Header, HTTPException
+
+
+async def require_admin(x_admin_token: str = Header(default="")):
+    """Guard admin and import routes with the ADMIN_API_TOKEN shared secret"""
+    expected = os.environ.get("ADMIN_API_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=503, detail="Admin API is disabled (ADMIN_API_TOKEN not set)")
+    if not hmac.compare_digest(x_admin_token.encode(), expected.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+async def require_metrics_token(authorization: str = Header(default=""), x_admin_token: str = Header(default="")):
+    """Guard /metrics with METRICS_TOKEN as a bearer token, or the admin token when it is unset"""
+    expected = os.environ.get("METRICS_TOKEN")
+    if not expected:
+        return await require_admin(x_admin_token)
+    if not hmac.compare_digest(authorization.encode(), f"Bearer {expected}".encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
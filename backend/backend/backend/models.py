@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field, EmailStr
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 import uuid
 
@@ -25,11 +25,29 @@ class AboutSection(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+# Public read models; these describe the shapes the read routes serve
+class AboutContent(BaseModel):
+    title: str
+    description: str
+    story: List[str]
+
+class ProfileDocument(BaseModel):
+    name: str
+    tagline: str
+    subtitle: str
+    email: EmailStr
+    phone: str
+    location: str
+    website: str
+    profileImage: str
+    about: AboutContent
+
 # Skills Models
 class SkillCategory(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     category: str
     items: List[str]
+    order: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -70,6 +88,45 @@ class Testimonial(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+# Admin Content Models
+# Partial updates for the admin content API; only the fields sent are changed
+class ContentUpdate(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    id: str
+
+class SkillCategoryUpdate(ContentUpdate):
+    category: Optional[str] = None
+    items: Optional[List[str]] = None
+    order: Optional[int] = None
+
+class ExperienceUpdate(ContentUpdate):
+    title: Optional[str] = None
+    company: Optional[str] = None
+    period: Optional[str] = None
+    location: Optional[str] = None
+    type: Optional[str] = None
+    achievements: Optional[List[str]] = None
+    order: Optional[int] = None
+
+class ProjectUpdate(ContentUpdate):
+    title: Optional[str] = None
+    description: Optional[str] = None
+    image: Optional[str] = None
+    metrics: Optional[List[str]] = None
+    tags: Optional[List[str]] = None
+    order: Optional[int] = None
+    featured: Optional[bool] = None
+
+class TestimonialUpdate(ContentUpdate):
+    text: Optional[str] = None
+    author: Optional[str] = None
+    role: Optional[str] = None
+    featured: Optional[bool] = None
+    order: Optional[int] = None
+
+class ContentReorder(BaseModel):
+    ids: List[str]  # the new order, first to last
+
 # Contact Models
 class ContactMessage(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -79,6 +136,10 @@ class ContactMessage(BaseModel):
     message: str
     service_type: str
     status: str = "new"  # new, read, responded
+    ghl_sync_status: str = "pending"  # pending, retrying, synced, failed, skipped
+    ghl_contact_id: Optional[str] = None
+    ghl_sync_error: Optional[str] = None
+    ghl_synced_at: Optional[datetime] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -93,3 +154,28 @@ class ContactMessageResponse(BaseModel):
     success: bool
     message: str
     id: Optional[str] = None
+
+# Aggregated portfolio document served by /api/portfolio
+class PortfolioDocument(BaseModel):
+    profile: ProfileDocument
+    skills: List[SkillCategory]
+    experience: List[Experience]
+    projects: List[Project]
+    testimonials: List[Testimonial]
+
+# /api/search results
+class SearchHit(BaseModel):
+    type: str  # project, experience, skill
+    title: str
+    score: float
+    document: Dict[str, Any]
+
+class SearchFacets(BaseModel):
+    types: Dict[str, int]
+    tags: Dict[str, int]
+
+class SearchResponse(BaseModel):
+    query: str
+    total: int
+    hits: List[SearchHit]
+    facets: SearchFacets
@@ -1,19 +1,44 @@
-from fastapi import FastAPI, APIRouter, HTTPException
-from dotenv import load_dotenv
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Depends, Query, Body
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse, ORJSONResponse
 from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from pydantic import BaseModel, ValidationError
 import os
+import io
+import csv
+import asyncio
+import tempfile
 import logging
 import httpx
-from pathlib import Path
+import orjson
+import config  # noqa: F401
 from models import *
-from database import DatabaseManager
+from database import (
+    DatabaseManager, db, close_client, contact_messages_collection, contact_rollups_collection,
+    CONTENT_COLLECTIONS, EDITABLE_CONTENT,
+)
+from cache import RETRY_MAX_SECONDS, RETRY_MIN_SECONDS, content_cache, invalidation_broadcast, watch_collection_changes
+from snapshot import snapshots
+from search import SEARCH_TYPES, search_service
+from http_cache import conditional_response
+from outbox import ghl_outbox
 from ghl_integration import ghl_integration
-
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
+from bulk_ingest import BulkFormatError, ingest_contacts, iter_json_array, iter_ndjson
+from auth import require_admin, require_metrics_token
+from rate_limit import RateLimited, client_ip, contact_guard
+from tenants import resolve_tenant
+from indexes import ensure_indexes, check as check_query_plans
+from locks import mongo_lock
+from analytics import BUCKET_FORMATS, contact_analytics, naive_utc, rebuild_rollups
+import instrumentation
 
 # Create the main app without a prefix
-app = FastAPI(title="Jennifer Lowe Portfolio API", version="1.0.0")
+app = FastAPI(
+    title="Jennifer Lowe Portfolio API",
+    version="1.0.0",
+    default_response_class=ORJSONResponse
+)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -23,119 +48,354 @@ api_router = APIRouter(prefix="/api")
 async def root():
     return {"message": "Jennifer Lowe Portfolio API", "version": "1.0.0"}
 
-@api_router.get("/profile")
-async def get_profile():
-    """Get profile information"""
+async def serve_snapshot(request: Request, name: str, tenant_id: str):
+    """Serve a tenant's pre-serialized snapshot with ETag/Cache-Control validators"""
     try:
-        profile = await DatabaseManager.get_profile()
-        about = await DatabaseManager.get_about()
-        
-        if not profile or not about:
-            raise HTTPException(status_code=404, detail="Profile information not found")
-        
-        return {
-            "name": profile["name"],
-            "tagline": profile["tagline"],
-            "subtitle": profile["subtitle"],
-            "email": profile["email"],
-            "phone": profile["phone"],
-            "location": profile["location"],
-            "website": profile["website"],
-            "profileImage": profile["profile_image"],
-            "about": {
-                "title": about["title"],
-                "description": about["description"],
-                "story": about["story"]
-            }
-        }
+        payload = await snapshots.get(name, tenant_id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching profile: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error fetching {name}: {str(e)}")
+    return conditional_response(request, payload, name)
 
-@api_router.get("/skills")
-async def get_skills():
+@api_router.get("/portfolio", response_model=PortfolioDocument)
+async def get_portfolio(request: Request, tenant_id: str = Depends(resolve_tenant)):
+    """Get the whole portfolio in one pre-serialized response"""
+    return await serve_snapshot(request, "portfolio", tenant_id)
+
+@api_router.get("/profile", response_model=ProfileDocument)
+async def get_profile(request: Request, tenant_id: str = Depends(resolve_tenant)):
+    """Get profile information"""
+    return await serve_snapshot(request, "profile", tenant_id)
+
+@api_router.get("/skills", response_model=List[SkillCategory])
+async def get_skills(request: Request, tenant_id: str = Depends(resolve_tenant)):
     """Get all skills"""
-    try:
-        skills = await DatabaseManager.get_skills()
-        return skills
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching skills: {str(e)}")
+    return await serve_snapshot(request, "skills", tenant_id)
 
-@api_router.get("/experience")
-async def get_experience():
+@api_router.get("/experience", response_model=List[Experience])
+async def get_experience(request: Request, tenant_id: str = Depends(resolve_tenant)):
     """Get professional experience"""
-    try:
-        experience = await DatabaseManager.get_experience()
-        return experience
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching experience: {str(e)}")
+    return await serve_snapshot(request, "experience", tenant_id)
 
-@api_router.get("/projects")
-async def get_projects():
+@api_router.get("/projects", response_model=List[Project])
+async def get_projects(request: Request, tenant_id: str = Depends(resolve_tenant)):
     """Get featured projects"""
-    try:
-        projects = await DatabaseManager.get_projects()
-        return projects
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching projects: {str(e)}")
+    return await serve_snapshot(request, "projects", tenant_id)
 
-@api_router.get("/testimonials")
-async def get_testimonials():
+@api_router.get("/testimonials", response_model=List[Testimonial])
+async def get_testimonials(request: Request, tenant_id: str = Depends(resolve_tenant)):
     """Get testimonials"""
+    return await serve_snapshot(request, "testimonials", tenant_id)
+
+@api_router.get("/ready")
+async def readiness():
+    """Readiness probe: Mongo reachable and the database prepared, plus warm-up state"""
     try:
-        testimonials = await DatabaseManager.get_testimonials()
-        return testimonials
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching testimonials: {str(e)}")
+        await asyncio.wait_for(db.command("ping"), timeout=2.0)
+        mongo = True
+    except Exception:
+        mongo = False
+    ready = mongo and startup_state["prepared"]
+    body = {
+        "ready": ready,
+        "mongo": mongo,
+        **startup_state,
+        "snapshots": {name: snapshots.is_built(name) for name in snapshots.names()},
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
+@api_router.get("/search", response_model=SearchResponse)
+async def search_content(q: str = Query("", max_length=200),
+                 type: Optional[str] = Query(None, pattern=f"^({'|'.join(SEARCH_TYPES)})$"),
+                 tag: Optional[str] = None,
+                 limit: int = Query(20, ge=1, le=100),
+                 tenant_id: str = Depends(resolve_tenant)):
+    """Search projects, experience and skills by word or word prefix, with tag facets"""
+    try:
+        return await search_service.search(q, tenant_id, type, tag, limit)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
 @api_router.post("/contact", response_model=ContactMessageResponse)
-async def submit_contact_form(contact_data: ContactMessageCreate):
-    """Submit contact form and integrate with GoHighLevel"""
+async def submit_contact_form(contact_data: ContactMessageCreate, request: Request,
+                              tenant_id: str = Depends(resolve_tenant)):
+    """Submit contact form and queue the GoHighLevel sync"""
     try:
-        # Save to local database
-        message_id = await DatabaseManager.create_contact_message(contact_data)
-        
-        # Send to GoHighLevel
-        ghl_contact = None
-        try:
-            contact_dict = contact_data.dict()
-            ghl_contact = await ghl_integration.create_contact(contact_dict)
-            
-            if ghl_contact:
-                logging.info(f"Successfully integrated contact with GHL: {contact_data.email}")
-                
-                # Create opportunity based on service type - check both response formats
-                contact_id = None
-                if ghl_contact.get("contact", {}).get("id"):
-                    contact_id = ghl_contact["contact"]["id"]
-                elif ghl_contact.get("id"):
-                    contact_id = ghl_contact["id"]
-                
-                if contact_id:
-                    opportunity = await ghl_integration.create_opportunity(
-                        contact_id, 
-                        contact_data.service_type
-                    )
-                    if opportunity:
-                        logging.info(f"Created opportunity for contact {contact_id}")
-                    else:
-                        logging.warning(f"Failed to create opportunity for contact {contact_id}")
-            else:
-                logging.warning(f"Failed to integrate with GHL for: {contact_data.email}")
-                
-        except Exception as ghl_error:
-            logging.error(f"GHL integration error: {str(ghl_error)}")
-            # Continue without failing the entire request
-        
+        is_new = await contact_guard.check(
+            client_ip(request), contact_data.email, contact_data.message, contact_data.service_type, tenant_id
+        )
+    except RateLimited as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many messages, please try again later.",
+            headers={"Retry-After": contact_guard.retry_after_header(e)}
+        )
+    if not is_new:
+        # Same submission again (double click, resend): acknowledge without storing or syncing
         return ContactMessageResponse(
             success=True,
-            message="Thank you for your message! I'll get back to you within 24 hours.",
-            id=message_id
+            message="Thank you for your message! I'll get back to you within 24 hours."
         )
+    
+    try:
+        # Save to local database
+        message_id = await DatabaseManager.create_contact_message(contact_data, tenant_id)
     except Exception as e:
+        # Not stored, so a retry must not be taken for a duplicate
+        await contact_guard.release(contact_data.email, contact_data.message, contact_data.service_type, tenant_id)
         raise HTTPException(status_code=500, detail=f"Error submitting contact form: {str(e)}")
+    
+    # Queue the GoHighLevel sync; outbox workers deliver it with retries
+    try:
+        await ghl_outbox.enqueue(message_id, contact_data.dict(), tenant_id)
+    except Exception as outbox_error:
+        logging.error(f"Failed to queue GHL sync for {message_id}: {str(outbox_error)}")
+        # The message is stored; continue without failing the entire request
+    
+    return ContactMessageResponse(
+        success=True,
+        message="Thank you for your message! I'll get back to you within 24 hours.",
+        id=message_id
+    )
+
+@api_router.post("/contact/bulk", dependencies=[Depends(require_admin)])
+async def submit_contacts_bulk(request: Request, tenant_id: str = Depends(resolve_tenant)):
+    """Import many contact messages from a JSON array or NDJSON upload.
+
+    The body is parsed as it streams in, stored in unordered chunks and
+    queued for GoHighLevel sync; the response is an NDJSON report with one
+    line per record followed by a summary line. The report is spooled to a
+    temporary file because the body must be fully read before a streaming
+    response starts listening for client disconnects.
+    """
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        parse = iter_ndjson
+    elif "json" in content_type:
+        parse = iter_json_array
+    else:
+        raise HTTPException(status_code=415, detail="Send application/json or application/x-ndjson")
+    
+    report = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    summary = {"created": 0, "invalid": 0, "error": 0}
+    try:
+        async for result in ingest_contacts(parse(request.stream()), tenant_id):
+            summary[result["status"]] += 1
+            report.write(orjson.dumps(result, option=orjson.OPT_APPEND_NEWLINE))
+    except BulkFormatError as e:
+        report.write(orjson.dumps({"status": "aborted", "errors": [str(e)]}, option=orjson.OPT_APPEND_NEWLINE))
+    report.write(orjson.dumps({"summary": summary}, option=orjson.OPT_APPEND_NEWLINE))
+    report.seek(0)
+    
+    def report_lines():
+        with report:
+            yield from report
+    
+    return StreamingResponse(report_lines(), media_type="application/x-ndjson")
+
+# Admin API Routes
+admin_router = APIRouter(prefix="/api/admin", dependencies=[Depends(require_admin)])
+
+CONTACT_EXPORT_FIELDS = [
+    "_id", "id", "created_at", "name", "email", "subject", "message",
+    "service_type", "status", "ghl_sync_status", "ghl_contact_id",
+]
+
+@admin_router.get("/contact-messages")
+async def list_contact_messages(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    service_type: Optional[str] = None,
+    tenant_id: str = Depends(resolve_tenant),
+):
+    """List contact messages newest first with cursor pagination"""
+    try:
+        messages, next_cursor = await DatabaseManager.list_contact_messages(
+            tenant_id, limit=limit, cursor=cursor, status=status, service_type=service_type
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ORJSONResponse({"items": messages, "next_cursor": next_cursor})
+
+@admin_router.get("/contact-messages/export")
+async def export_contact_messages(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    status: Optional[str] = None,
+    service_type: Optional[str] = None,
+    tenant_id: str = Depends(resolve_tenant),
+):
+    """Stream every matching contact message as NDJSON or CSV"""
+    messages = DatabaseManager.iter_contact_messages(tenant_id, status=status, service_type=service_type)
+    
+    async def ndjson_rows():
+        async for message in messages:
+            yield orjson.dumps(message, option=orjson.OPT_APPEND_NEWLINE)
+    
+    async def csv_rows():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=CONTACT_EXPORT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        async for message in messages:
+            writer.writerow(jsonable_encoder(message))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    
+    if format == "csv":
+        return StreamingResponse(csv_rows(), media_type="text/csv", headers={
+            "Content-Disposition": 'attachment; filename="contact_messages.csv"'
+        })
+    return StreamingResponse(ndjson_rows(), media_type="application/x-ndjson")
+
+@admin_router.get("/analytics/contacts")
+async def get_contact_analytics(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    bucket: str = Query("day", pattern=f"^({'|'.join(BUCKET_FORMATS)})$"),
+    tenant_id: str = Depends(resolve_tenant),
+):
+    """Lead counts and estimated value per service type and time bucket (UTC days; default last 30)"""
+    start, end = naive_utc(start), naive_utc(end)
+    if start and end and start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return await contact_analytics(tenant_id, start, end, bucket)
+
+@admin_router.post("/analytics/contacts/rebuild")
+async def rebuild_contact_analytics(tenant_id: str = Depends(resolve_tenant)):
+    """Recount the tenant's contact rollups from its stored messages"""
+    return {"rollups": await rebuild_rollups(tenant_id)}
+
+# Largest batch the content admin routes accept in one request
+CONTENT_BATCH_LIMIT = int(os.environ.get("CONTENT_BATCH_LIMIT", "500"))
+
+def content_models(collection: str):
+    """The (document, partial update) models of an editable content collection"""
+    if collection not in EDITABLE_CONTENT:
+        raise HTTPException(status_code=404, detail=f"Unknown content collection: {collection}")
+    return EDITABLE_CONTENT[collection]
+
+def validate_batch(model: type, items: List[Dict[str, Any]]) -> List[BaseModel]:
+    """Validate every item against ``model``; one invalid item rejects the whole batch"""
+    if len(items) > CONTENT_BATCH_LIMIT:
+        raise HTTPException(status_code=413, detail=f"At most {CONTENT_BATCH_LIMIT} items per request")
+    valid, invalid = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append(model(**item))
+        except ValidationError as e:
+            invalid.append({"index": index, "errors": [err["msg"] for err in e.errors()]})
+    if invalid:
+        raise HTTPException(status_code=422, detail=invalid)
+    return valid
+
+@admin_router.post("/content/{collection}", status_code=201)
+async def create_content(collection: str, items: List[Dict[str, Any]] = Body(...),
+                         tenant_id: str = Depends(resolve_tenant)):
+    """Create skills, experience, projects or testimonials in one batch"""
+    model, _ = content_models(collection)
+    ids = await DatabaseManager.create_content(collection, validate_batch(model, items), tenant_id)
+    return {"created": ids}
+
+@admin_router.patch("/content/{collection}")
+async def update_content(collection: str, items: List[Dict[str, Any]] = Body(...),
+                         tenant_id: str = Depends(resolve_tenant)):
+    """Partially update content documents by id in one batch; only the fields sent change"""
+    _, update_model = content_models(collection)
+    updates, invalid = [], []
+    for index, update in enumerate(validate_batch(update_model, items)):
+        fields = update.dict(exclude_unset=True)
+        doc_id = fields.pop("id")
+        if not fields:
+            invalid.append({"index": index, "errors": ["No fields to update"]})
+        elif any(value is None for value in fields.values()):
+            invalid.append({"index": index, "errors": ["Content fields cannot be null"]})
+        updates.append((doc_id, fields))
+    if invalid:
+        raise HTTPException(status_code=422, detail=invalid)
+    missing = await DatabaseManager.update_content(collection, updates, tenant_id)
+    return {"updated": len(updates) - len(missing), "missing": missing}
+
+@admin_router.put("/content/{collection}/order")
+async def reorder_content(collection: str, reorder: ContentReorder, tenant_id: str = Depends(resolve_tenant)):
+    """Set the display order of content documents to the order of the ids sent"""
+    content_models(collection)
+    if len(reorder.ids) > CONTENT_BATCH_LIMIT:
+        raise HTTPException(status_code=413, detail=f"At most {CONTENT_BATCH_LIMIT} items per request")
+    if len(set(reorder.ids)) != len(reorder.ids):
+        raise HTTPException(status_code=422, detail="Duplicate ids")
+    missing = await DatabaseManager.reorder_content(collection, reorder.ids, tenant_id)
+    return {"updated": len(reorder.ids) - len(missing), "missing": missing}
+
+# Operational counters; admin only, they reveal traffic and integration health
+@admin_router.get("/search/stats")
+async def get_search_stats():
+    """Search index counters"""
+    return search_service.stats()
+
+@admin_router.get("/cache/stats")
+async def get_cache_stats():
+    """Content cache hit/miss counters"""
+    return content_cache.stats()
+
+@admin_router.get("/contact/limits")
+async def get_contact_limit_stats():
+    """Contact form rate limiter rejections and suppressed duplicates"""
+    return contact_guard.stats()
+
+@admin_router.get("/outbox/stats")
+async def get_outbox_stats():
+    """GoHighLevel sync job counts per status"""
+    return await ghl_outbox.stats()
+
+@admin_router.get("/ghl/pool")
+async def get_ghl_pool_stats():
+    """GoHighLevel HTTP connection pool usage"""
+    return ghl_integration.pool_stats()
+
+@admin_router.get("/ghl/circuit")
+async def get_ghl_circuit_stats():
+    """GoHighLevel circuit breaker state and counters per location"""
+    return ghl_integration.breaker_stats()
 
 # Include the router in the main app
 app.include_router(api_router)
+app.include_router(admin_router)
+
+if instrumentation.ENABLED:
+    app.add_middleware(instrumentation.InstrumentationMiddleware)
+    instrumentation.add_gauge_source(lambda: {
+        f"content_cache_{name}": value for name, value in content_cache.stats().items()
+    })
+    instrumentation.add_gauge_source(lambda: {
+        f"cache_broadcast_{name}": value for name, value in invalidation_broadcast.stats().items()
+    })
+    instrumentation.add_gauge_source(lambda: {
+        f"ghl_pool_{name}": value for name, value in ghl_integration.pool_stats().items()
+    })
+    instrumentation.add_gauge_source(lambda: {
+        f"ghl_circuit_{name}": value for name, value in ghl_integration.breaker_stats().items()
+        if name != "locations"
+    })
+    instrumentation.add_gauge_source(lambda: {
+        f"snapshot_{name}": value for name, value in snapshots.stats().items()
+    })
+    instrumentation.add_gauge_source(lambda: {
+        f"search_{name}": value for name, value in search_service.stats().items()
+    })
+    instrumentation.add_gauge_source(lambda: {
+        f"contact_rate_limit_{name}": value for name, value in contact_guard.stats().items()
+    })
+
+    @app.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_metrics_token)])
+    async def metrics():
+        """Prometheus metrics"""
+        return instrumentation.render_metrics()
+
+# Compresses everything else; snapshot routes arrive already encoded and pass through
+app.add_middleware(GZipMiddleware, minimum_size=int(os.environ.get("COMPRESS_MIN_BYTES", "512")))
 
 app.add_middleware(
     CORSMiddleware,
@@ -152,12 +412,75 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Background warm-up progress, reported by /api/ready
+startup_state = {"backfilled": False, "seeded": False, "indexes": False, "rollups": False,
+                 "prepared": False, "cache_warm": False}
+
+async def prepare_database():
+    """Backfill, seed and index; steps already done are skipped and the first failure is raised"""
+    if not startup_state["backfilled"]:
+        # Before seeding, so a pre-multi-tenancy profile is not seeded over
+        await DatabaseManager.backfill_tenant()
+        startup_state["backfilled"] = True
+    if not startup_state["seeded"] and os.environ.get("SEED_ON_STARTUP", "true").lower() == "true":
+        await DatabaseManager.init_default_data()
+        startup_state["seeded"] = True
+    if not startup_state["indexes"]:
+        await ensure_indexes()
+        startup_state["indexes"] = True
+    if not startup_state["rollups"]:
+        # Messages stored before rollups existed are counted once; later recounts are run by hand
+        if not await contact_rollups_collection.find_one() and await contact_messages_collection.find_one():
+            logger.info(f"Built {await rebuild_rollups()} contact rollups")
+        startup_state["rollups"] = True
+
+async def prepare_in_background():
+    """Prepare the database and warm caches without holding up request serving"""
+    delay = RETRY_MIN_SECONDS
+    while True:
+        try:
+            # One worker process at a time, so the default data is seeded exactly once
+            async with mongo_lock("startup", ttl=float(os.environ.get("STARTUP_LOCK_TTL_SECONDS", "300"))):
+                await prepare_database()
+            break
+        except Exception as e:
+            logger.error(f"Database preparation failed, retrying in {delay:.0f}s: {str(e)}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RETRY_MAX_SECONDS)
+    startup_state["prepared"] = True
+    try:
+        await asyncio.gather(*(snapshots.get(name) for name in snapshots.names()))
+        await search_service.index()
+        startup_state["cache_warm"] = True
+    except Exception as e:
+        logger.error(f"Cache warm-up failed: {str(e)}")
+
+async def follow_content_changes():
+    """Invalidate caches on writes made by other processes"""
+    await watch_collection_changes(db, content_cache, CONTENT_COLLECTIONS + ["tenants"])
+    # Only returns when change streams are unavailable (standalone Mongo)
+    if os.environ.get("CACHE_BROADCAST", "true").lower() == "true":
+        await invalidation_broadcast.run(db)
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database with default data on startup"""
-    await DatabaseManager.init_default_data()
+    """Start background workers; seeding and warm-up run off the serving path"""
+    if os.environ.get("VERIFY_QUERY_PLANS", "false").lower() == "true":
+        # Deliberately blocking: fails startup if any DatabaseManager query is unindexed
+        await check_query_plans()
+    await ghl_integration.startup()
+    await ghl_outbox.start()
+    app.state.prepare = asyncio.create_task(prepare_in_background())
+    app.state.cache_watcher = asyncio.create_task(follow_content_changes())
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     """Close database connection on shutdown"""
-    pass
+    tasks = [app.state.prepare, app.state.cache_watcher]
+    for task in tasks:
+        task.cancel()
+    # Let them unwind first: a cancelled prepare still releases its startup lock through the client
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await ghl_outbox.stop()
+    await ghl_integration.shutdown()
+    close_client()
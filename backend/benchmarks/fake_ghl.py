@@ -0,0 +1,54 @@
+import asyncio
+import random
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+class FakeGHLConfig:
+    """Knobs for the GoHighLevel stand-in"""
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.02, error_rate: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = 0
+
+
+def create_fake_ghl(config: FakeGHLConfig) -> FastAPI:
+    """A minimal GoHighLevel v1 API with injectable latency and error rate"""
+    app = FastAPI()
+
+    async def behave():
+        config.calls += 1
+        delay = max(0.0, config.latency + random.uniform(-config.jitter, config.jitter))
+        if delay:
+            await asyncio.sleep(delay)
+        if random.random() < config.error_rate:
+            return JSONResponse(status_code=503, content={"message": "injected failure"})
+        return None
+
+    @app.post("/v1/contacts/")
+    async def create_contact(request: Request):
+        failure = await behave()
+        if failure:
+            return failure
+        body = await request.json()
+        return {"contact": {"id": str(uuid.uuid4()), "email": body.get("email")}}
+
+    @app.get("/v1/pipelines/")
+    async def list_pipelines():
+        failure = await behave()
+        if failure:
+            return failure
+        return {"pipelines": [{"id": "bench-pipeline", "stages": [{"id": "bench-stage"}]}]}
+
+    @app.post("/v1/pipelines/{pipeline_id}/opportunities/")
+    async def create_opportunity(pipeline_id: str):
+        failure = await behave()
+        if failure:
+            return failure
+        return {"id": str(uuid.uuid4()), "pipelineId": pipeline_id}
+
+    return app
@@ -0,0 +1,200 @@
+"""Throughput and tail-latency benchmark for the portfolio API.
+
+Drives every /api endpoint in-process through the ASGI app, against
+mongomock-motor (default) or a real mongod, with a fake GoHighLevel server
+whose latency and error rate are injectable. Results can be saved as a
+baseline and later runs compared against it:
+
+    python benchmarks/run.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run.py --baseline benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+# The app uses flat imports across the backend directories
+sys.path[:0] = [str(BACKEND_DIR), str(BACKEND_DIR / "backend"), str(BACKEND_DIR / "backend" / "backend")]
+
+import httpx  # noqa: E402
+
+from fake_ghl import FakeGHLConfig, create_fake_ghl  # noqa: E402
+
+READ_ENDPOINTS = [
+    "/api/", "/api/portfolio", "/api/profile", "/api/skills",
+    "/api/experience", "/api/projects", "/api/testimonials",
+]
+CONTACT_ENDPOINT = "/api/contact"
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of ``samples`` (seconds)"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def contact_payload() -> Dict[str, str]:
+    token = uuid.uuid4().hex[:8]
+    return {
+        "name": f"Bench User {token}",
+        "email": f"bench+{token}@example.com",
+        "subject": "Benchmark",
+        "message": "Load test message",
+        "service_type": "General Inquiry",
+    }
+
+
+async def drive(client: httpx.AsyncClient, endpoint: str, total: int, concurrency: int) -> Dict[str, float]:
+    """Send ``total`` requests to ``endpoint`` with ``concurrency`` in flight"""
+    latencies: List[float] = []
+    errors = 0
+    remaining = total
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            if endpoint == CONTACT_ENDPOINT:
+                response = await client.post(endpoint, json=contact_payload())
+            else:
+                response = await client.get(endpoint)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def wait_for_outbox(outbox, timeout: float) -> Dict[str, float]:
+    """Time how long the GHL outbox takes to drain after the contact run"""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        stats = await outbox.stats(refresh=True)
+        if not stats.get("pending") and not stats.get("processing"):
+            break
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    stats = await outbox.stats(refresh=True)
+    synced = stats.get("done", 0)
+    return {"drain_seconds": round(elapsed, 3), "jobs_per_second": round(synced / elapsed, 1) if elapsed else 0.0, **stats}
+
+
+async def run(args) -> Dict[str, Dict[str, float]]:
+    os.environ.setdefault("GHL_API_KEY", "bench-key")
+    os.environ.setdefault("GHL_LOCATION_ID", "bench-location")
+    os.environ["GHL_OUTBOX_BASE_DELAY_SECONDS"] = "0.1"
+    # Every request comes from one client; measure the limiter's cost, not its rejections
+    os.environ.setdefault("RATE_LIMIT_IP_BURST", "1e9")
+    if args.mongo_url:
+        os.environ["MONGO_URL"] = args.mongo_url
+        os.environ["DB_NAME"] = f"portfolio_bench_{uuid.uuid4().hex[:8]}"
+
+    import database
+    if not args.mongo_url:
+        from mongomock_motor import AsyncMongoMockClient
+        database._client = AsyncMongoMockClient()
+
+    from ghl_integration import ghl_integration
+    ghl_config = FakeGHLConfig(latency=args.ghl_latency, error_rate=args.ghl_error_rate)
+    ghl_integration.base_url = "http://fake-ghl/v1"
+    ghl_integration._client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=create_fake_ghl(ghl_config)),
+        limits=ghl_integration.limits,
+        timeout=ghl_integration.timeout,
+    )
+
+    import server
+    # Per-request client logging would dominate the measurements
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    await server.startup_event()
+    await server.app.state.prepare
+
+    endpoints = args.endpoints or READ_ENDPOINTS + [CONTACT_ENDPOINT]
+    results: Dict[str, Dict[str, float]] = {}
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for endpoint in endpoints:
+            # Warm up the route before measuring it
+            await drive(client, endpoint, min(args.concurrency, args.requests), args.concurrency)
+            results[endpoint] = await drive(client, endpoint, args.requests, args.concurrency)
+            print(f"{endpoint:<22} {json.dumps(results[endpoint])}")
+
+    if CONTACT_ENDPOINT in endpoints:
+        results["ghl_outbox"] = await wait_for_outbox(server.ghl_outbox, args.outbox_timeout)
+        print(f"{'ghl_outbox':<22} {json.dumps(results['ghl_outbox'])} (fake GHL calls: {ghl_config.calls})")
+
+    await server.shutdown_db_client()
+    if args.mongo_url:
+        client = database.get_client()
+        await client.drop_database(os.environ["DB_NAME"])
+        database.close_client()
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """Describe every metric that regressed beyond ``tolerance`` relative to ``baseline``"""
+    regressions = []
+    for endpoint, current in results.items():
+        previous = baseline.get(endpoint)
+        if not previous:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if metric in previous and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{endpoint} {metric}: {previous[metric]} -> {current[metric]}")
+        if "rps" in previous and current["rps"] < previous["rps"] * (1 - tolerance):
+            regressions.append(f"{endpoint} rps: {previous['rps']} -> {current['rps']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=20, help="requests in flight per endpoint")
+    parser.add_argument("--endpoints", nargs="*", help="subset of endpoints to drive")
+    parser.add_argument("--mongo-url", help="use a real mongod (a throwaway database is created and dropped)")
+    parser.add_argument("--ghl-latency", type=float, default=0.05, help="fake GHL latency in seconds")
+    parser.add_argument("--ghl-error-rate", type=float, default=0.0, help="fraction of fake GHL calls that fail")
+    parser.add_argument("--outbox-timeout", type=float, default=60.0, help="seconds to wait for the outbox to drain")
+    parser.add_argument("--baseline", help="compare against this baseline JSON and exit 1 on regression")
+    parser.add_argument("--save-baseline", help="write results to this baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+        print(f"Saved baseline to {args.save_baseline}")
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        if regressions:
+            print("❌ Regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("✅ No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
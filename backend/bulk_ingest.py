@@ -0,0 +1,249 @@
+import codecs
+import json
+import logging
+import os
+from typing import Any, AsyncIterator, Dict, Iterator, List, Tuple
+
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from models import ContactMessage, ContactMessageCreate
+from database import DatabaseManager, contact_messages_collection, DEFAULT_TENANT
+from outbox import ghl_outbox
+
+logger = logging.getLogger(__name__)
+
+INSERT_CHUNK_SIZE = int(os.environ.get("BULK_INSERT_CHUNK_SIZE", "500"))
+# Largest single record we are willing to buffer while waiting for it to complete
+MAX_RECORD_BYTES = int(os.environ.get("BULK_MAX_RECORD_BYTES", "65536"))
+
+_decoder = json.JSONDecoder()
+
+
+class BulkFormatError(ValueError):
+    """The upload body is not a JSON array or NDJSON stream"""
+
+
+def _over_limit(buffer: str, pos: int = 0) -> bool:
+    """Whether ``buffer[pos:]`` is more than MAX_RECORD_BYTES once UTF-8 encoded"""
+    chars = len(buffer) - pos
+    # A character is 1-4 bytes, so only a tail in between needs encoding
+    if chars > MAX_RECORD_BYTES or 4 * chars <= MAX_RECORD_BYTES:
+        return chars > MAX_RECORD_BYTES
+    return len(buffer[pos:].encode()) > MAX_RECORD_BYTES
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[Any, str]]:
+    """Yield ``(record, error)`` per line of an NDJSON byte stream"""
+    text = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += text.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            if line.strip():
+                yield _parse_line(line)
+        if _over_limit(buffer):
+            raise BulkFormatError(f"NDJSON line exceeds {MAX_RECORD_BYTES} bytes")
+    buffer += text.decode(b"", final=True)
+    if buffer.strip():
+        yield _parse_line(buffer)
+
+
+def _parse_line(line: str) -> Tuple[Any, str]:
+    try:
+        return json.loads(line), ""
+    except json.JSONDecodeError as e:
+        return None, f"Invalid JSON: {e.msg}"
+
+
+# A decode error this close to the end of the buffer may be a token cut off by
+# the chunk boundary (``tru``, ``\u00``), so it is retried with more data
+INCOMPLETE_TAIL = 6
+
+
+def _resync(buffer: str, pos: int) -> int:
+    """Position of the ',' or ']' ending the array element at ``pos``; -1 if the buffer ends first"""
+    depth = 0
+    in_string = escaped = False
+    for i in range(pos, len(buffer)):
+        char = buffer[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "[{":
+            depth += 1
+        elif char in "]}":
+            if depth == 0:
+                return i
+            depth -= 1
+        elif char == "," and depth == 0:
+            return i
+    return -1
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[Any, str]]:
+    """Yield ``(record, error)`` per element of a top-level JSON array, incrementally.
+
+    A malformed element is reported as an error for its index and parsing
+    resumes at the next element; if the next element cannot be found the
+    upload is abandoned with a BulkFormatError naming the element.
+    """
+    text = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    pos = 0
+    index = 0
+    started = finished = False
+    expect_value = True
+
+    def skip_ws(i: int) -> int:
+        while i < len(buffer) and buffer[i] in " \t\r\n":
+            i += 1
+        return i
+
+    def parse(final: bool) -> Iterator[Tuple[Any, str]]:
+        nonlocal pos, index, started, finished, expect_value
+        while not finished:
+            pos = skip_ws(pos)
+            if pos >= len(buffer):
+                return
+            if not started:
+                if buffer[pos] != "[":
+                    raise BulkFormatError("Expected a JSON array of contact records")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                finished = True
+                return
+            if not expect_value:
+                if buffer[pos] != ",":
+                    raise BulkFormatError(f"Expected ',' or ']' after element {index - 1}, got {buffer[pos]!r}")
+                expect_value = True
+                pos += 1
+                continue
+            try:
+                record, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                incomplete = len(buffer) - e.pos <= INCOMPLETE_TAIL or e.msg.startswith("Unterminated string")
+                if incomplete and not final:
+                    # An element split across chunks; wait for more data
+                    if _over_limit(buffer, pos):
+                        raise BulkFormatError(f"JSON array element {index} exceeds {MAX_RECORD_BYTES} bytes")
+                    return
+                end = _resync(buffer, pos)
+                if end < 0:
+                    if not final and not _over_limit(buffer, pos):
+                        return
+                    raise BulkFormatError(
+                        f"Malformed JSON in element {index} ({e.msg}); it and any later elements were not read"
+                    )
+                record = None
+                error = f"Invalid JSON: {e.msg}; skipped to the next element"
+            else:
+                error = ""
+            pos = end
+            expect_value = False
+            index += 1
+            yield record, error
+
+    async for chunk in chunks:
+        buffer = buffer[pos:] + text.decode(chunk)
+        pos = 0
+        for item in parse(final=False):
+            yield item
+        if finished:
+            break
+    if not finished:
+        buffer = buffer[pos:] + text.decode(b"", final=True)
+        pos = 0
+        for item in parse(final=True):
+            yield item
+    if not finished:
+        raise BulkFormatError("Unterminated JSON array")
+
+
+async def ingest_contacts(records: AsyncIterator[Tuple[Any, str]],
+                          tenant_id: str = DEFAULT_TENANT) -> AsyncIterator[Dict[str, Any]]:
+    """Validate, store and queue GHL sync for a stream of contact records.
+
+    Yields one result per record, tagged with its input index, so the caller
+    can stream the report back without holding the upload in memory. Valid
+    records are reported when their chunk is written, so invalid records can
+    be reported before earlier valid ones.
+    """
+    chunk: List[Tuple[int, Dict[str, Any]]] = []
+    index = 0
+    aborted = None
+    try:
+        async for record, error in records:
+            if error:
+                yield {"index": index, "status": "invalid", "errors": [error]}
+            elif not isinstance(record, dict):
+                yield {"index": index, "status": "invalid", "errors": ["Record must be a JSON object"]}
+            else:
+                try:
+                    contact = ContactMessageCreate(**record)
+                except ValidationError as e:
+                    yield {"index": index, "status": "invalid", "errors": [err["msg"] for err in e.errors()]}
+                else:
+                    chunk.append((index, {**ContactMessage(**contact.dict()).dict(), "tenant_id": tenant_id}))
+            index += 1
+            if len(chunk) >= INSERT_CHUNK_SIZE:
+                for result in await _flush(chunk, tenant_id):
+                    yield result
+                chunk = []
+    except BulkFormatError as e:
+        # Keep the records that parsed before the upload went bad
+        aborted = e
+    if chunk:
+        for result in await _flush(chunk, tenant_id):
+            yield result
+    if aborted is not None:
+        raise aborted
+
+
+async def _flush(chunk: List[Tuple[int, Dict[str, Any]]], tenant_id: str) -> List[Dict[str, Any]]:
+    """Insert a chunk unordered and queue GHL sync jobs for the stored records"""
+    documents = [document for _, document in chunk]
+    failed: Dict[int, str] = {}
+    try:
+        await contact_messages_collection.insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        for write_error in e.details.get("writeErrors", []):
+            failed[write_error["index"]] = write_error.get("errmsg", "Write failed")
+    except Exception as e:
+        logger.error(f"Bulk contact insert failed: {str(e)}")
+        return [{"index": index, "status": "error", "errors": [str(e)]} for index, _ in chunk]
+
+    results = []
+    jobs = []
+    stored = []
+    for position, (index, document) in enumerate(chunk):
+        if position in failed:
+            results.append({"index": index, "status": "error", "errors": [failed[position]]})
+            continue
+        stored.append(document)
+        message_id = str(document["_id"])
+        results.append({"index": index, "status": "created", "id": message_id})
+        jobs.append((message_id, {
+            "name": document["name"],
+            "email": document["email"],
+            "subject": document["subject"],
+            "message": document["message"],
+            "service_type": document["service_type"],
+        }))
+
+    await DatabaseManager.record_contact_rollups(stored, tenant_id)
+    if jobs:
+        try:
+            await ghl_outbox.enqueue_many(jobs, tenant_id)
+        except Exception as e:
+            logger.error(f"Failed to queue GHL sync for {len(jobs)} bulk contacts: {str(e)}")
+    return results
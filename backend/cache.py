@@ -0,0 +1,353 @@
+import asyncio
+import inspect
+import logging
+import os
+import socket
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+logger = logging.getLogger(__name__)
+
+
+class ContentCache:
+    """In-process read-through cache for portfolio content.
+
+    Entries expire after ``ttl`` seconds and the least recently used entry is
+    evicted once ``max_entries`` is reached. Concurrent misses for the same key
+    share a single loader call. Every entry is tagged with the Mongo
+    collections it was read from, and the tenant it was read for, so writes
+    can invalidate precisely. Entries loaded without a tenant are dropped by a
+    write to any tenant.
+    """
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._tags: Dict[Tuple[str, Optional[str]], Set[Hashable]] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._listeners: List[Callable[[Optional[str], Optional[str]], None]] = []
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                          collections: Iterable[str] = (), tenant_id: Optional[str] = None) -> Any:
+        """Return the cached value for ``key`` or load it exactly once"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self._drop(key)
+
+        self.misses += 1
+        pending = self._inflight.get(key)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if pending.cancelled():
+                    # The loading request went away; take over the load
+                    return await self.get_or_load(key, loader, collections, tenant_id)
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        # Tag before loading so an invalidation during the load is noticed
+        for collection in collections:
+            self._tags.setdefault((collection, tenant_id), set()).add(key)
+        try:
+            self.loads += 1
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            # Only store the value if no invalidation raced with the load
+            if self._inflight.get(key) is future:
+                self._store(key, value, collections, tenant_id)
+            future.set_result(value)
+            return value
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def cached(self, *collections: str, key: Optional[str] = None):
+        """Decorate an async getter so its result is served from the cache.
+
+        A ``tenant_id`` parameter of the getter scopes the entry to that tenant.
+        """
+        def decorator(func: Callable[..., Awaitable[Any]]):
+            name = key or func.__name__
+            signature = inspect.signature(func)
+            scoped = "tenant_id" in signature.parameters
+
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                # Keyed on the bound arguments, so f("t"), f(tenant_id="t") and f() share an entry
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                cache_key = (name, tuple(
+                    (arg, tuple(sorted(value.items())) if isinstance(value, dict) else value)
+                    for arg, value in bound.arguments.items()
+                ))
+                tenant_id = bound.arguments["tenant_id"] if scoped else None
+                return await self.get_or_load(
+                    cache_key, lambda: func(*args, **kwargs), collections, tenant_id
+                )
+
+            wrapper.uncached = func
+            return wrapper
+        return decorator
+
+    def invalidate_collection(self, collection: str, tenant_id: Optional[str] = None):
+        """Drop every entry read from ``collection`` for ``tenant_id`` (every tenant when None)"""
+        self.invalidations += 1
+        if tenant_id is None:
+            tags = [tag for tag in self._tags if tag[0] == collection]
+        else:
+            tags = [(collection, tenant_id), (collection, None)]
+        for tag in tags:
+            for key in list(self._tags.pop(tag, ())):
+                self._drop(key)
+                self._inflight.pop(key, None)
+        self._notify(collection, tenant_id)
+
+    def clear(self):
+        """Drop every entry"""
+        self.invalidations += 1
+        self._entries.clear()
+        self._tags.clear()
+        self._inflight.clear()
+        self._notify(None, None)
+
+    def add_listener(self, callback: Callable[[Optional[str], Optional[str]], None]):
+        """Register a callback run with the collection and tenant on invalidation (None means all)"""
+        self._listeners.append(callback)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters suitable for scraping"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _store(self, key: Hashable, value: Any, collections: Iterable[str], tenant_id: Optional[str]):
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        for collection in collections:
+            self._tags.setdefault((collection, tenant_id), set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest, _ = self._entries.popitem(last=False)
+            self._untag(oldest)
+            self.evictions += 1
+
+    def _drop(self, key: Hashable):
+        if self._entries.pop(key, None) is not None:
+            self._untag(key)
+
+    def _untag(self, key: Hashable):
+        for keys in self._tags.values():
+            keys.discard(key)
+
+    def _notify(self, collection: Optional[str], tenant_id: Optional[str]):
+        for callback in self._listeners:
+            try:
+                callback(collection, tenant_id)
+            except Exception as e:
+                logger.error(f"Cache invalidation listener failed: {str(e)}")
+
+
+# Backoff between attempts to reach a Mongo feature after a connection failure
+RETRY_MIN_SECONDS = 1.0
+RETRY_MAX_SECONDS = 60.0
+# Server errors meaning change streams never work here: not a replica set, or too old a server
+CHANGE_STREAMS_UNSUPPORTED = {40573, 40324}
+# Server errors meaning capped collections cannot be created or tailed here
+CAPPED_UNSUPPORTED = {2, 20, 72, 115}
+
+
+def unsupported(error: Exception, codes: Set[int]) -> bool:
+    """Whether ``error`` means the deployment lacks a feature, rather than a failure worth retrying"""
+    # Test doubles such as mongomock raise these for what they do not implement
+    if isinstance(error, (NotImplementedError, TypeError)):
+        return True
+    return isinstance(error, OperationFailure) and error.code in codes
+
+
+async def watch_collection_changes(db, cache: ContentCache, collections: Iterable[str]):
+    """Invalidate cache entries from a Mongo change stream until cancelled.
+
+    Change streams require a replica set; if the server reports they are
+    unsupported this logs once and returns, leaving write-driven
+    invalidation in place. Connection failures, before or after the stream
+    first opens, are retried with backoff. Inserts and updates invalidate
+    only the changed document's tenant; deletes carry no document and
+    invalidate every tenant.
+    """
+    watched = list(collections)
+    pipeline = [{"$match": {"ns.coll": {"$in": watched}}}]
+    delay = RETRY_MIN_SECONDS
+    while True:
+        try:
+            async with db.watch(pipeline, full_document="updateLookup") as stream:
+                logger.info(f"Watching content changes on {', '.join(watched)}")
+                delay = RETRY_MIN_SECONDS
+                async for change in stream:
+                    document = change.get("fullDocument") or {}
+                    cache.invalidate_collection(change["ns"]["coll"], document.get("tenant_id"))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if unsupported(e, CHANGE_STREAMS_UNSUPPORTED):
+                logger.info(f"Change streams unavailable ({str(e)}); relying on write-driven cache invalidation")
+                return
+            logger.error(f"Content change stream failed, retrying in {delay:.0f}s: {str(e)}")
+            # Anything may have changed while the stream was down
+            cache.clear()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RETRY_MAX_SECONDS)
+
+
+class InvalidationBroadcast:
+    """Relays cache invalidations between worker processes through a capped collection.
+
+    For deployments without change streams: each process publishes its own
+    invalidations and tails the collection for everyone else's, so a write
+    handled by one worker is not served stale by the others until the TTL.
+    """
+
+    def __init__(self, cache: ContentCache, collection: str = "cache_events", size: int = 1024 * 1024):
+        self.cache = cache
+        self.collection = collection
+        self.size = size
+        self.origin: Optional[str] = None
+        self.active = False
+        self.published = 0
+        self.received = 0
+        self._db = None
+        self._applying = False
+        self._writes: Set[asyncio.Task] = set()
+        cache.add_listener(self.publish)
+
+    def publish(self, collection: Optional[str], tenant_id: Optional[str] = None):
+        """Cache listener: announce a local invalidation to the other workers"""
+        if not self.active or self._applying:
+            return
+        event = {"collection": collection, "tenant_id": tenant_id, "origin": self.origin}
+        task = asyncio.get_running_loop().create_task(self._db[self.collection].insert_one(event))
+        self._writes.add(task)
+        task.add_done_callback(self._written)
+        self.published += 1
+
+    def _written(self, task: asyncio.Task):
+        self._writes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Failed to broadcast cache invalidation: {str(task.exception())}")
+
+    def _apply(self, event: Dict[str, Any]):
+        if event.get("origin") == self.origin:
+            return
+        self.received += 1
+        self._applying = True
+        try:
+            if event.get("collection") is None:
+                self.cache.clear()
+            else:
+                self.cache.invalidate_collection(event["collection"], event.get("tenant_id"))
+        finally:
+            self._applying = False
+
+    async def run(self, db):
+        """Tail invalidation events until cancelled; returns if capped collections are unsupported.
+
+        Connection failures, before or after tailing starts, are retried with backoff.
+        """
+        self._db = db
+        # Per process, so set here rather than in a parent that forks workers
+        self.origin = f"{socket.gethostname()}:{os.getpid()}"
+        events = db[self.collection]
+        last_id = None
+        connected = False
+        delay = RETRY_MIN_SECONDS
+        try:
+            while True:
+                try:
+                    if not self.active:
+                        try:
+                            await db.create_collection(self.collection, capped=True, size=self.size)
+                        except CollectionInvalid:
+                            pass  # another worker created it
+                        # Start after the newest event; older ones were already reflected in what we load
+                        latest = await events.find_one({}, sort=[("$natural", -1)])
+                        last_id = latest["_id"] if latest else None
+                        self.active = True
+                    query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+                    cursor = events.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+                    while cursor.alive:
+                        async for event in cursor:
+                            last_id = event["_id"]
+                            self._apply(event)
+                        if not connected:
+                            connected = True
+                            logger.info(f"Broadcasting cache invalidations as {self.origin}")
+                        delay = RETRY_MIN_SECONDS
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    if unsupported(e, CAPPED_UNSUPPORTED):
+                        logger.info(f"Cache invalidation broadcast unavailable ({str(e)})")
+                        return
+                    logger.error(f"Cache invalidation broadcast failed, retrying in {delay:.0f}s: {str(e)}")
+                    if self.active:
+                        # Events may have been missed while disconnected
+                        self._applying = True
+                        try:
+                            self.cache.clear()
+                        finally:
+                            self._applying = False
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, RETRY_MAX_SECONDS)
+                    continue
+                # An empty capped collection closes the cursor at once; poll until events arrive
+                await asyncio.sleep(1)
+        finally:
+            self.active = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters suitable for scraping"""
+        return {"active": self.active, "published": self.published, "received": self.received}
+
+
+# Each tenant caches one entry per DatabaseManager content getter; all tenants share one directory entry
+ENTRIES_PER_TENANT = 6
+CONTENT_CACHE_TENANTS = int(os.environ.get("CONTENT_CACHE_TENANTS", "128"))
+
+content_cache = ContentCache(
+    ttl=float(os.environ.get("CONTENT_CACHE_TTL_SECONDS", "300")),
+    max_entries=int(os.environ.get("CONTENT_CACHE_MAX_ENTRIES", str(CONTENT_CACHE_TENANTS * ENTRIES_PER_TENANT + 1))),
+)
+invalidation_broadcast = InvalidationBroadcast(content_cache)
@@ -0,0 +1,120 @@
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """The dependency is failing; calls are refused for ``retry_after`` seconds"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} circuit is open; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker over the outcomes of the last ``window`` calls.
+
+    A call counts as failed if it errored or took longer than
+    ``slow_call_seconds``. Once at least ``min_calls`` are recorded and the
+    failed share reaches ``failure_threshold`` the circuit opens and refuses
+    calls for ``reset_timeout`` seconds, then lets ``half_open_calls`` trial
+    calls through: if they all succeed it closes, any failure reopens it.
+    """
+
+    def __init__(self, name: str, window: int = 20, min_calls: int = 5, failure_threshold: float = 0.5,
+                 slow_call_seconds: float = 5.0, reset_timeout: float = 30.0, half_open_calls: int = 1):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trials = 0
+        self._trial_successes = 0
+        self.opened_total = 0
+        self.rejected_total = 0
+        self.slow_calls_total = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def retry_after(self) -> float:
+        """Seconds until calls are let through again; 0 when they are now"""
+        state = self.state
+        if state == OPEN:
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+        if state == HALF_OPEN and self._trials >= self.half_open_calls:
+            return 1.0
+        return 0.0
+
+    def before_call(self):
+        """Reserve a call; raise CircuitOpenError if the circuit refuses it"""
+        wait = self.retry_after()
+        if wait > 0:
+            self.rejected_total += 1
+            raise CircuitOpenError(self.name, wait)
+        if self._state == HALF_OPEN:
+            self._trials += 1
+
+    def record(self, success: bool, duration: float):
+        """Record the outcome of a call reserved with before_call()"""
+        if success and duration > self.slow_call_seconds:
+            self.slow_calls_total += 1
+            success = False
+        if self._state == HALF_OPEN:
+            if not success:
+                self._transition(OPEN)
+            else:
+                self._trial_successes += 1
+                if self._trial_successes >= self.half_open_calls:
+                    self._transition(CLOSED)
+            return
+        self._outcomes.append(success)
+        if self._state == CLOSED and len(self._outcomes) >= self.min_calls:
+            failures = self._outcomes.count(False)
+            if failures / len(self._outcomes) >= self.failure_threshold:
+                self._transition(OPEN)
+
+    def release(self):
+        """Give back a call reserved with before_call() that ended without an outcome"""
+        if self._state == HALF_OPEN and self._trials > 0:
+            self._trials -= 1
+
+    def _transition(self, state: str):
+        logger.warning(f"{self.name} circuit {self._state} -> {state}")
+        self._state = state
+        self._trials = 0
+        self._trial_successes = 0
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self.opened_total += 1
+        elif state == CLOSED:
+            self._outcomes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """State and counters suitable for scraping"""
+        state = self.state
+        return {
+            "state": state,
+            "state_code": STATE_CODES[state],
+            "window_calls": len(self._outcomes),
+            "window_failures": self._outcomes.count(False),
+            "opened_total": self.opened_total,
+            "rejected_total": self.rejected_total,
+            "slow_calls_total": self.slow_calls_total,
+            "retry_after_seconds": round(self.retry_after(), 3),
+        }
@@ -0,0 +1,8 @@
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Load .env once for the whole backend; every module imports this first.
+# The backend directory's .env wins, then one found from the working directory.
+load_dotenv(Path(__file__).parent / '.env')
+load_dotenv()
@@ -1,37 +1,208 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, InsertOne, UpdateOne
+from bson import ObjectId
+from pydantic import BaseModel
+from typing import Dict, List, Optional, Tuple
 from models import *
+import config  # noqa: F401
 import os
-from dotenv import load_dotenv
+import json
+import base64
+import asyncio
+import logging
+import uuid
+from collections import Counter
 
-load_dotenv()
+from cache import content_cache
+from instrumentation import timed_db
 
-# MongoDB connection
+logger = logging.getLogger(__name__)
+
+# MongoDB connection, created on first use rather than at import
 mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017/')
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ.get('DB_NAME', 'portfolio_db')]
+db_name = os.environ.get('DB_NAME', 'portfolio_db')
+_client: Optional[AsyncIOMotorClient] = None
+
+def get_client() -> AsyncIOMotorClient:
+    """The process-wide Motor client"""
+    global _client
+    if _client is None:
+        _client = AsyncIOMotorClient(
+            mongo_url,
+            serverSelectionTimeoutMS=int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+        )
+    return _client
+
+def close_client():
+    """Close the Motor client; the next access opens a new one"""
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+def _forget_client_after_fork():
+    # The parent's client and its sockets belong to the parent; a forked worker opens its own
+    global _client
+    _client = None
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_client_after_fork)
+
+class _LazyDatabase:
+    """Proxy to the configured database that resolves the client on access"""
+
+    def __getattr__(self, name):
+        return getattr(get_client()[db_name], name)
+
+    def __getitem__(self, name):
+        return get_client()[db_name][name]
+
+class _LazyCollection:
+    """Proxy to a collection that resolves the client on access"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_client()[db_name][self.name], attr)
+
+db = _LazyDatabase()
 
 # Collection references
-profile_collection = db.profile
-about_collection = db.about
-skills_collection = db.skills
-experience_collection = db.experience
-projects_collection = db.projects
-testimonials_collection = db.testimonials
-contact_messages_collection = db.contact_messages
+profile_collection = _LazyCollection("profile")
+about_collection = _LazyCollection("about")
+skills_collection = _LazyCollection("skills")
+experience_collection = _LazyCollection("experience")
+projects_collection = _LazyCollection("projects")
+testimonials_collection = _LazyCollection("testimonials")
+contact_messages_collection = _LazyCollection("contact_messages")
+ghl_outbox_collection = _LazyCollection("ghl_outbox")
+rate_limits_collection = _LazyCollection("rate_limits")
+contact_dedup_collection = _LazyCollection("contact_dedup")
+tenants_collection = _LazyCollection("tenants")
+locks_collection = _LazyCollection("locks")
+contact_rollups_collection = _LazyCollection("contact_rollups")
+
+# Collections whose reads are served through the content cache
+CONTENT_COLLECTIONS = ["profile", "about", "skills", "experience", "projects", "testimonials"]
+# Collections whose documents carry a tenant_id
+TENANT_COLLECTIONS = CONTENT_COLLECTIONS + ["contact_messages", "ghl_outbox"]
+
+# Tenant served for unknown hosts; documents written before multi-tenancy belong to it
+DEFAULT_TENANT = os.environ.get('DEFAULT_TENANT', 'default')
+
+# Query shapes used by DatabaseManager; indexes.py checks each one has an index
+SINGLETON_SORT = [("_id", ASCENDING)]
+ORDER_SORT = [("order", ASCENDING)]
+# Skills seeded before they had an order keep their insertion order
+SKILL_SORT = ORDER_SORT + SINGLETON_SORT
+FEATURED_QUERY = {"featured": True}
+# Content collections editable through the admin API: (document model, partial update model)
+EDITABLE_CONTENT = {
+    "skills": (SkillCategory, SkillCategoryUpdate),
+    "experience": (Experience, ExperienceUpdate),
+    "projects": (Project, ProjectUpdate),
+    "testimonials": (Testimonial, TestimonialUpdate),
+}
+# Content documents carry their own string ``id``; Mongo's ObjectId never leaves the server
+CONTENT_PROJECTION = {"_id": 0, "tenant_id": 0}
+
+# Keyset pagination order for contact messages, newest first
+CONTACT_MESSAGE_SORT = [("created_at", DESCENDING), ("_id", DESCENDING)]
+
+def encode_cursor(message: dict) -> str:
+    """Opaque pagination cursor pointing just after ``message``"""
+    raw = json.dumps({"c": message["created_at"].isoformat(), "i": str(message["_id"])})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> dict:
+    """Keyset filter for the page after ``cursor``; raises ValueError if malformed"""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created_at = datetime.fromisoformat(raw["c"])
+        message_id = ObjectId(raw["i"])
+    except Exception:
+        raise ValueError("Invalid cursor")
+    # The top-level bound keeps this an index range scan; the $or trims ties
+    return {
+        "created_at": {"$lte": created_at},
+        "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"_id": {"$lt": message_id}},
+        ],
+    }
+
+def rollup_day(created_at: datetime) -> datetime:
+    """The UTC day a contact message is counted under"""
+    return datetime(created_at.year, created_at.month, created_at.day)
+
+# Message fields tallied per rollup, and the rollup field holding each tally
+ROLLUP_TALLIES = {"status": "statuses", "ghl_sync_status": "sync_statuses"}
+
+def contact_rollup_id(tenant_id: str, day: datetime, service_type: str) -> str:
+    return f"{tenant_id}|{day:%Y-%m-%d}|{service_type}"
+
+def contact_rollup_updates(messages: List[dict], tenant_id: str = DEFAULT_TENANT) -> List[UpdateOne]:
+    """$inc upserts adding ``messages`` to the per-day, per-service counts and status tallies"""
+    increments: Dict[tuple, Counter] = {}
+    for message in messages:
+        counts = increments.setdefault((rollup_day(message["created_at"]), message["service_type"]), Counter())
+        counts["count"] += 1
+        for field, tally in ROLLUP_TALLIES.items():
+            counts[f"{tally}.{message.get(field, 'unknown')}"] += 1
+    now = datetime.utcnow()
+    return [
+        UpdateOne(
+            {"_id": contact_rollup_id(tenant_id, day, service_type)},
+            {"$inc": dict(counts), "$set": {"updated_at": now},
+             "$setOnInsert": {"tenant_id": tenant_id, "day": day, "service_type": service_type}},
+            upsert=True,
+        )
+        for (day, service_type), counts in increments.items()
+    ]
+
+def contact_rollup_status_update(message: dict, field: str, value: str) -> Optional[UpdateOne]:
+    """Move ``message`` from its stored ``field`` value to ``value`` in its rollup's tally"""
+    old = message.get(field, "unknown")
+    if old == value:
+        return None
+    tally = ROLLUP_TALLIES[field]
+    rollup_id = contact_rollup_id(
+        message.get("tenant_id", DEFAULT_TENANT), rollup_day(message["created_at"]), message["service_type"]
+    )
+    return UpdateOne(
+        {"_id": rollup_id},
+        {"$inc": {f"{tally}.{old}": -1, f"{tally}.{value}": 1}, "$set": {"updated_at": datetime.utcnow()}},
+    )
+
+def tenant_filter(tenant_id: str, query: Optional[dict] = None) -> dict:
+    """Scope ``query`` to one tenant; tenant_id leads every content index"""
+    return {"tenant_id": tenant_id, **(query or {})}
+
+def contact_message_filter(tenant_id: str = DEFAULT_TENANT, status: Optional[str] = None,
+                           service_type: Optional[str] = None) -> dict:
+    """Mongo filter for the admin contact message listing"""
+    query = {"tenant_id": tenant_id}
+    if status:
+        query["status"] = status
+    if service_type:
+        query["service_type"] = service_type
+    return query
 
 class DatabaseManager:
     """Database operations manager"""
     
     @staticmethod
-    async def init_default_data():
+    @timed_db
+    async def init_default_data(tenant_id: str = DEFAULT_TENANT):
         """Initialize database with default portfolio data"""
         
         # Check if profile already exists
-        existing_profile = await profile_collection.find_one()
+        existing_profile = await profile_collection.find_one(tenant_filter(tenant_id))
         if existing_profile:
             return
         
-        # Insert default profile
+        # Default profile
         default_profile = Profile(
             name="Jennifer Ann Lowe",
             tagline="Transforming Challenges Into Success Stories",
@@ -42,9 +213,8 @@ class DatabaseManager:
             website="stayvolcano.com",
             profile_image="https://customer-assets.emergentagent.com/job_206f622d-a351-459e-9358-22cbc368f865/artifacts/3tq2mims_Jenn%20blue%20background.png"
         )
-        await profile_collection.insert_one(default_profile.dict())
         
-        # Insert default about section
+        # Default about section
         default_about = AboutSection(
             title="About Me",
             description="I'm built differently - I thrive on solving complex regulatory challenges and tackling overwhelming problems that others avoid. My superpower is transforming obstacles that paralyze people into breakthrough solutions, whether it's navigating complex statutes, codes, or innovative financial strategies.",
@@ -54,9 +224,8 @@ class DatabaseManager:
                 "Whether it's regulatory navigation, innovative financial strategies, or personal transformation, I bring the same fearless problem-solving approach and relentless efficiency that has defined my success across industries."
             ]
         )
-        await about_collection.insert_one(default_about.dict())
         
-        # Insert default skills
+        # Default skills
         default_skills = [
             SkillCategory(
                 category="Strategic Problem-Solving",
@@ -80,72 +249,185 @@ class DatabaseManager:
             )
         ]
         
-        for skill in default_skills:
-            await skills_collection.insert_one(skill.dict())
+        # One round trip per collection, issued concurrently
+        await asyncio.gather(
+            profile_collection.insert_one({**default_profile.dict(), "tenant_id": tenant_id}),
+            about_collection.insert_one({**default_about.dict(), "tenant_id": tenant_id}),
+            skills_collection.insert_many(
+                [{**skill.dict(), "order": order, "tenant_id": tenant_id} for order, skill in enumerate(default_skills)], ordered=False
+            ),
+        )
+        
+        for collection in ("profile", "about", "skills"):
+            content_cache.invalidate_collection(collection, tenant_id)
         
         print("✅ Default portfolio data initialized successfully")
 
     @staticmethod
-    async def get_profile():
+    @content_cache.cached("profile")
+    @timed_db
+    async def get_profile(tenant_id: str = DEFAULT_TENANT):
         """Get profile information"""
-        profile = await profile_collection.find_one()
-        if profile:
-            profile['_id'] = str(profile['_id'])
-            return profile
-        return None
+        return await profile_collection.find_one(
+            tenant_filter(tenant_id), projection=CONTENT_PROJECTION, sort=SINGLETON_SORT
+        )
 
     @staticmethod
-    async def get_about():
+    @content_cache.cached("about")
+    @timed_db
+    async def get_about(tenant_id: str = DEFAULT_TENANT):
         """Get about section"""
-        about = await about_collection.find_one()
-        if about:
-            about['_id'] = str(about['_id'])
-            return about
-        return None
+        return await about_collection.find_one(
+            tenant_filter(tenant_id), projection=CONTENT_PROJECTION, sort=SINGLETON_SORT
+        )
 
     @staticmethod
-    async def get_skills():
+    @content_cache.cached("skills")
+    @timed_db
+    async def get_skills(tenant_id: str = DEFAULT_TENANT):
         """Get all skills"""
-        skills = await skills_collection.find().to_list(100)
-        for skill in skills:
-            skill['_id'] = str(skill['_id'])
-        return skills
+        return await skills_collection.find(tenant_filter(tenant_id), CONTENT_PROJECTION).sort(SKILL_SORT).to_list(100)
 
     @staticmethod
-    async def get_experience():
+    @content_cache.cached("experience")
+    @timed_db
+    async def get_experience(tenant_id: str = DEFAULT_TENANT):
         """Get all experience"""
-        experience = await experience_collection.find().sort("order", 1).to_list(100)
-        for exp in experience:
-            exp['_id'] = str(exp['_id'])
-        return experience
+        return await experience_collection.find(tenant_filter(tenant_id), CONTENT_PROJECTION).sort(ORDER_SORT).to_list(100)
 
     @staticmethod
-    async def get_projects():
+    @content_cache.cached("projects")
+    @timed_db
+    async def get_projects(tenant_id: str = DEFAULT_TENANT):
         """Get all projects"""
-        projects = await projects_collection.find({"featured": True}).sort("order", 1).to_list(100)
-        for project in projects:
-            project['_id'] = str(project['_id'])
-        return projects
+        return await projects_collection.find(tenant_filter(tenant_id, FEATURED_QUERY), CONTENT_PROJECTION).sort(ORDER_SORT).to_list(100)
 
     @staticmethod
-    async def get_testimonials():
+    @content_cache.cached("testimonials")
+    @timed_db
+    async def get_testimonials(tenant_id: str = DEFAULT_TENANT):
         """Get all testimonials"""
-        testimonials = await testimonials_collection.find({"featured": True}).sort("order", 1).to_list(100)
-        for testimonial in testimonials:
-            testimonial['_id'] = str(testimonial['_id'])
-        return testimonials
+        return await testimonials_collection.find(tenant_filter(tenant_id, FEATURED_QUERY), CONTENT_PROJECTION).sort(ORDER_SORT).to_list(100)
 
     @staticmethod
-    async def create_contact_message(message_data: ContactMessageCreate):
+    @timed_db
+    async def create_content(collection: str, documents: List[BaseModel], tenant_id: str = DEFAULT_TENANT):
+        """Insert content documents in one unordered batch; returns their new ids"""
+        now = datetime.utcnow()
+        docs = [
+            {**document.dict(), "id": str(uuid.uuid4()), "created_at": now, "updated_at": now, "tenant_id": tenant_id}
+            for document in documents
+        ]
+        if docs:
+            await db[collection].bulk_write([InsertOne(doc) for doc in docs], ordered=False)
+            content_cache.invalidate_collection(collection, tenant_id)
+        return [doc["id"] for doc in docs]
+
+    @staticmethod
+    @timed_db
+    async def update_content(collection: str, updates: List[Tuple[str, dict]], tenant_id: str = DEFAULT_TENANT):
+        """Apply partial ``(id, fields)`` updates in one unordered batch; returns ids that matched nothing"""
+        if not updates:
+            return []
+        now = datetime.utcnow()
+        result = await db[collection].bulk_write([
+            UpdateOne(tenant_filter(tenant_id, {"id": doc_id}), {"$set": {**fields, "updated_at": now}})
+            for doc_id, fields in updates
+        ], ordered=False)
+        if result.modified_count:
+            content_cache.invalidate_collection(collection, tenant_id)
+        if result.matched_count == len(updates):
+            return []
+        ids = [doc_id for doc_id, _ in updates]
+        found = set(await db[collection].distinct("id", tenant_filter(tenant_id, {"id": {"$in": ids}})))
+        return [doc_id for doc_id in ids if doc_id not in found]
+
+    @staticmethod
+    async def reorder_content(collection: str, ids: List[str], tenant_id: str = DEFAULT_TENANT):
+        """Set ``order`` to each document's position in ``ids``; returns ids that matched nothing"""
+        return await DatabaseManager.update_content(
+            collection, [(doc_id, {"order": order}) for order, doc_id in enumerate(ids)], tenant_id
+        )
+
+    @staticmethod
+    @timed_db
+    async def create_contact_message(message_data: ContactMessageCreate, tenant_id: str = DEFAULT_TENANT):
         """Create new contact message"""
         message = ContactMessage(**message_data.dict())
-        result = await contact_messages_collection.insert_one(message.dict())
+        document = {**message.dict(), "tenant_id": tenant_id}
+        result = await contact_messages_collection.insert_one(document)
+        await DatabaseManager.record_contact_rollups([document], tenant_id)
         return str(result.inserted_id)
 
     @staticmethod
-    async def get_contact_messages():
+    async def record_contact_rollups(messages: List[dict], tenant_id: str = DEFAULT_TENANT):
+        """Count newly stored contact messages into the analytics rollups"""
+        updates = contact_rollup_updates(messages, tenant_id)
+        if not updates:
+            return
+        try:
+            await contact_rollups_collection.bulk_write(updates, ordered=False)
+        except Exception as e:
+            # The messages are stored; analytics.rebuild_rollups() recounts from them
+            logger.error(f"Failed to update contact rollups: {str(e)}")
+
+    @staticmethod
+    async def record_contact_status_change(message: dict, field: str, value: str):
+        """Move a contact message between status tallies; ``message`` is the document before the change"""
+        update = contact_rollup_status_update(message, field, value)
+        if update is None:
+            return
+        try:
+            await contact_rollups_collection.bulk_write([update])
+        except Exception as e:
+            logger.error(f"Failed to update contact rollup tallies: {str(e)}")
+
+    @staticmethod
+    @timed_db
+    async def get_contact_messages(tenant_id: str = DEFAULT_TENANT):
         """Get all contact messages"""
-        messages = await contact_messages_collection.find().sort("created_at", -1).to_list(100)
+        messages = await contact_messages_collection.find(tenant_filter(tenant_id)).sort(CONTACT_MESSAGE_SORT).to_list(100)
         for message in messages:
             message['_id'] = str(message['_id'])
         return messages
+
+    @staticmethod
+    @timed_db
+    async def list_contact_messages(tenant_id: str = DEFAULT_TENANT, limit: int = 50, cursor: Optional[str] = None,
+                                    status: Optional[str] = None, service_type: Optional[str] = None):
+        """Get one page of contact messages, newest first, and the cursor for the next page"""
+        query = contact_message_filter(tenant_id, status, service_type)
+        if cursor:
+            query.update(decode_cursor(cursor))
+        messages = await contact_messages_collection.find(query).sort(CONTACT_MESSAGE_SORT).to_list(limit + 1)
+        next_cursor = encode_cursor(messages[limit - 1]) if len(messages) > limit else None
+        messages = messages[:limit]
+        for message in messages:
+            message['_id'] = str(message['_id'])
+        return messages, next_cursor
+
+    @staticmethod
+    async def iter_contact_messages(tenant_id: str = DEFAULT_TENANT, status: Optional[str] = None,
+                                    service_type: Optional[str] = None):
+        """Stream every matching contact message, newest first, without buffering the collection"""
+        cursor = contact_messages_collection.find(
+            contact_message_filter(tenant_id, status, service_type)
+        ).sort(CONTACT_MESSAGE_SORT).batch_size(500)
+        async for message in cursor:
+            message['_id'] = str(message['_id'])
+            yield message
+
+    @staticmethod
+    @timed_db
+    async def backfill_tenant(tenant_id: str = DEFAULT_TENANT):
+        """Assign documents written before multi-tenancy to ``tenant_id``"""
+        results = await asyncio.gather(*(
+            db[collection].update_many({"tenant_id": {"$exists": False}}, {"$set": {"tenant_id": tenant_id}})
+            for collection in TENANT_COLLECTIONS
+        ))
+        updated = sum(result.modified_count for result in results)
+        if updated:
+            for collection in CONTENT_COLLECTIONS:
+                content_cache.invalidate_collection(collection, tenant_id)
+            print(f"✅ Assigned {updated} untenanted documents to tenant '{tenant_id}'")
+        return updated
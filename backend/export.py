@@ -0,0 +1,268 @@
+"""Static export of the portfolio content for CDN hosting.
+
+Writes every snapshot as content-hashed JSON with gzip and (when the
+``brotli`` package is installed) brotli variants beside it, plus a
+``manifest.json`` per tenant naming the current file of each section:
+
+    python export.py                      # every tenant into ../frontend/public/content
+    python export.py --tenant jenn --html # one tenant, with pre-rendered HTML fragments
+    python export.py --watch              # keep re-exporting as content changes
+    python export.py --if-reachable       # build step: skip when MongoDB is down
+
+Unchanged sections keep their files, so a re-export only writes the
+sections whose content changed. Files named by the previous manifest are
+kept for clients still holding it; anything older is pruned.
+
+The frontend's prebuild step (frontend/scripts/export-content.sh) runs this
+with --if-reachable, so the build copies the files into frontend/build/content
+for vercel.json to serve; the frontend reads them through the manifest.
+"""
+import argparse
+import asyncio
+import hashlib
+import html
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import orjson
+
+import config  # noqa: F401
+from cache import content_cache, watch_collection_changes
+from database import db, close_client, tenants_collection, CONTENT_COLLECTIONS, DEFAULT_TENANT
+from snapshot import snapshots, compress, brotli
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUT = Path(__file__).resolve().parent.parent / "frontend" / "public" / "content"
+MANIFEST = "manifest.json"
+
+
+# File suffix per content-coding, as nginx gzip_static/brotli_static expect
+SUFFIXES = {"gzip": ".gz", "br": ".br"}
+
+
+def write_atomic(path: Path, data: bytes):
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def write_versioned(directory: Path, name: str, body: bytes,
+                    variants: Optional[Dict[str, bytes]] = None) -> List[str]:
+    """Write ``body`` and its compressed variants unless already present; return the file names"""
+    files = [name]
+    path = directory / name
+    if not path.exists():
+        write_atomic(path, body)
+    for coding, data in (variants or compress(body)).items():
+        suffix = SUFFIXES[coding]
+        files.append(name + suffix)
+        if not (directory / (name + suffix)).exists():
+            write_atomic(directory / (name + suffix), data)
+    return files
+
+
+def _escape(value: Any) -> str:
+    return html.escape(str(value or ""))
+
+
+def _list(items: List[Any], css: str) -> str:
+    return f'<ul class="{css}">' + "".join(f"<li>{_escape(item)}</li>" for item in items) + "</ul>"
+
+
+def render_profile(profile: Dict[str, Any]) -> str:
+    about = profile["about"]
+    return (
+        '<section id="about" data-section="profile">'
+        f'<h1>{_escape(profile["name"])}</h1>'
+        f'<p class="tagline">{_escape(profile["tagline"])}</p>'
+        f'<p class="subtitle">{_escape(profile["subtitle"])}</p>'
+        f'<h2>{_escape(about["title"])}</h2>'
+        f'<p>{_escape(about["description"])}</p>'
+        + "".join(f"<p>{_escape(paragraph)}</p>" for paragraph in about["story"])
+        + "</section>"
+    )
+
+
+def render_skills(skills: List[Dict[str, Any]]) -> str:
+    return '<section id="skills" data-section="skills">' + "".join(
+        f'<div class="skill-category"><h3>{_escape(skill["category"])}</h3>{_list(skill["items"], "skills")}</div>'
+        for skill in skills
+    ) + "</section>"
+
+
+def render_experience(experience: List[Dict[str, Any]]) -> str:
+    return '<section id="experience" data-section="experience">' + "".join(
+        f'<article class="experience"><h3>{_escape(job["title"])}</h3>'
+        f'<p class="company">{_escape(job["company"])} · {_escape(job["location"])}</p>'
+        f'<p class="period">{_escape(job["period"])} · {_escape(job["type"])}</p>'
+        f'{_list(job["achievements"], "achievements")}</article>'
+        for job in experience
+    ) + "</section>"
+
+
+def render_projects(projects: List[Dict[str, Any]]) -> str:
+    return '<section id="projects" data-section="projects">' + "".join(
+        f'<article class="project"><h3>{_escape(project["title"])}</h3>'
+        f'<p>{_escape(project["description"])}</p>'
+        f'{_list(project["metrics"], "metrics")}{_list(project["tags"], "tags")}</article>'
+        for project in projects
+    ) + "</section>"
+
+
+def render_testimonials(testimonials: List[Dict[str, Any]]) -> str:
+    return '<section id="testimonials" data-section="testimonials">' + "".join(
+        f'<blockquote class="testimonial"><p>{_escape(testimonial["text"])}</p>'
+        f'<footer>{_escape(testimonial["author"])}, {_escape(testimonial["role"])}</footer></blockquote>'
+        for testimonial in testimonials
+    ) + "</section>"
+
+
+# Sections with an HTML fragment; the portfolio section is their concatenation
+FRAGMENTS: Dict[str, Callable[[Any], str]] = {
+    "profile": render_profile,
+    "skills": render_skills,
+    "experience": render_experience,
+    "projects": render_projects,
+    "testimonials": render_testimonials,
+}
+
+
+def read_manifest(directory: Path) -> Dict[str, Any]:
+    try:
+        return orjson.loads((directory / MANIFEST).read_bytes())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return {}
+
+
+async def export_tenant(out: Path, tenant_id: str, html_fragments: bool = False) -> List[str]:
+    """Export one tenant's sections; return the names of the sections that changed"""
+    directory = out / tenant_id
+    directory.mkdir(parents=True, exist_ok=True)
+    previous = read_manifest(directory)
+    previous_sections = previous.get("sections", {})
+    sections: Dict[str, Dict[str, Any]] = {}
+    changed = []
+
+    for name in snapshots.names():
+        try:
+            payload = await snapshots.get(name, tenant_id)
+        except LookupError as e:
+            logger.warning(f"Skipping {tenant_id}/{name}: {str(e)}")
+            continue
+        digest = payload.etag.strip('"')[:12]
+        files = write_versioned(directory, f"{name}.{digest}.json", payload.body, payload.encoded)
+        entry = {"file": files[0], "etag": payload.etag, "bytes": len(payload.body), "files": files}
+        if html_fragments and name in FRAGMENTS:
+            fragment = FRAGMENTS[name](orjson.loads(payload.body)).encode("utf-8")
+            html_files = write_versioned(directory, f"{name}.{digest}.html", fragment)
+            entry.update(html=html_files[0], html_files=html_files)
+        if previous_sections.get(name, {}).get("etag") != payload.etag:
+            changed.append(name)
+        sections[name] = entry
+
+    fingerprint = "".join(f"{name}={entry['etag']};" for name, entry in sorted(sections.items()))
+    version = hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+    if version == previous.get("version") and html_fragments == previous.get("html", False):
+        return []
+
+    manifest = {
+        "version": version,
+        "tenant": tenant_id,
+        "generated_at": datetime.utcnow().isoformat() + "Z",
+        "html": html_fragments,
+        "sections": sections,
+    }
+    write_atomic(directory / MANIFEST, orjson.dumps(manifest, option=orjson.OPT_INDENT_2))
+
+    # Keep the files both manifests name; a client may still hold the previous one
+    keep = {MANIFEST}
+    for section in list(sections.values()) + list(previous_sections.values()):
+        keep.update(section.get("files", []))
+        keep.update(section.get("html_files", []))
+    for path in directory.iterdir():
+        if path.is_file() and path.name not in keep and not path.name.startswith("."):
+            path.unlink()
+    logger.info(f"Exported {tenant_id} version {version} (changed: {', '.join(changed) or 'none'})")
+    return changed
+
+
+async def tenant_ids(requested: Optional[List[str]]) -> List[str]:
+    """The requested tenants, or the default tenant plus every registered one"""
+    if requested:
+        return requested
+    registered = await tenants_collection.distinct("_id")
+    return [DEFAULT_TENANT] + sorted(t for t in registered if t != DEFAULT_TENANT)
+
+
+async def export_all(out: Path, tenants: Optional[List[str]], html_fragments: bool) -> Dict[str, List[str]]:
+    """Export every tenant; return the changed sections per tenant"""
+    results = {}
+    for tenant_id in await tenant_ids(tenants):
+        results[tenant_id] = await export_tenant(out, tenant_id, html_fragments)
+    return results
+
+
+async def watch(out: Path, tenants: Optional[List[str]], html_fragments: bool,
+                interval: float, debounce: float = 1.0):
+    """Re-export whenever content changes, and at least every ``interval`` seconds"""
+    changed = asyncio.Event()
+    content_cache.add_listener(lambda collection, tenant_id: changed.set())
+    watcher = asyncio.create_task(watch_collection_changes(db, content_cache, CONTENT_COLLECTIONS + ["tenants"]))
+    try:
+        while True:
+            await export_all(out, tenants, html_fragments)
+            try:
+                await asyncio.wait_for(changed.wait(), interval)
+                # Let a burst of edits settle into one export
+                await asyncio.sleep(debounce)
+            except asyncio.TimeoutError:
+                pass
+            changed.clear()
+    finally:
+        watcher.cancel()
+
+
+async def mongo_reachable(timeout: float) -> bool:
+    """Whether MongoDB answers a ping within ``timeout`` seconds"""
+    try:
+        await asyncio.wait_for(db.command("ping"), timeout)
+        return True
+    except Exception as e:
+        logger.warning(f"MongoDB unreachable: {str(e) or type(e).__name__}")
+        return False
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", type=Path, default=Path(os.environ.get("EXPORT_DIR", DEFAULT_OUT)),
+                        help="output directory (one subdirectory per tenant)")
+    parser.add_argument("--tenant", action="append", help="tenant to export (repeatable; default: all)")
+    parser.add_argument("--html", action="store_true", help="also write pre-rendered HTML fragments")
+    parser.add_argument("--watch", action="store_true", help="keep running and re-export changed sections")
+    parser.add_argument("--interval", type=float, default=content_cache.ttl,
+                        help="with --watch, seconds between exports when no change is reported")
+    parser.add_argument("--if-reachable", action="store_true",
+                        help="exit successfully without exporting when MongoDB cannot be reached")
+    args = parser.parse_args()
+
+    if brotli is None:
+        logger.warning("brotli not installed; writing gzip variants only")
+    try:
+        if args.if_reachable and not await mongo_reachable(float(os.environ.get("EXPORT_CONNECT_TIMEOUT", "10"))):
+            logger.warning("Skipping the content export")
+            return
+        if args.watch:
+            await watch(args.out, args.tenant, args.html, args.interval)
+        else:
+            await export_all(args.out, args.tenant, args.html)
+    finally:
+        close_client()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -1,18 +1,102 @@
 import httpx
+import asyncio
 import logging
-from typing import Dict, Any, Optional
+import time
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, NamedTuple, Optional, Tuple
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
+import config  # noqa: F401
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from instrumentation import observe_external
 
 logger = logging.getLogger(__name__)
 
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Estimated opportunity value per service type
+SERVICE_VALUES = {
+    "Strategic Consulting": 5000,
+    "Regulatory Navigation Support": 3000,
+    "Transformation Coaching": 2500,
+    "Innovative Financial Strategies": 4000,
+    "Business System Optimization": 3500,
+    "General Inquiry": 1000
+}
+DEFAULT_SERVICE_VALUE = 1000
+
+# Opportunity POST statuses that suggest the cached pipeline/stage no longer exists
+STALE_PIPELINE_STATUSES = (400, 404, 422)
+
+# Monotonic time by which every GHL call in the current task must finish
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("ghl_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """A GHL call would not finish within the caller's deadline"""
+
+class GHLAccount(NamedTuple):
+    """GoHighLevel credentials for one tenant; pipeline/stage are discovery fallbacks"""
+    api_key: Optional[str]
+    location_id: Optional[str]
+    pipeline_id: Optional[str] = None
+    stage_id: Optional[str] = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key and self.location_id)
+
 class GoHighLevelIntegration:
     def __init__(self):
         self.api_key = os.getenv("GHL_API_KEY")
         self.location_id = os.getenv("GHL_LOCATION_ID")
         self.base_url = "https://rest.gohighlevel.com/v1"
+        self.http2 = os.getenv("GHL_HTTP2", "true").lower() == "true" and HTTP2_AVAILABLE
+        self.limits = httpx.Limits(
+            max_connections=int(os.getenv("GHL_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(os.getenv("GHL_MAX_KEEPALIVE_CONNECTIONS", "10")),
+            keepalive_expiry=float(os.getenv("GHL_KEEPALIVE_EXPIRY", "60")),
+        )
+        self.timeout = httpx.Timeout(
+            connect=float(os.getenv("GHL_CONNECT_TIMEOUT", "5")),
+            read=float(os.getenv("GHL_READ_TIMEOUT", "15")),
+            write=float(os.getenv("GHL_WRITE_TIMEOUT", "10")),
+            pool=float(os.getenv("GHL_POOL_TIMEOUT", "5")),
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        # Caps a whole call, which httpx's per-phase timeouts do not
+        self.call_deadline = float(os.getenv("GHL_CALL_DEADLINE_SECONDS", "10"))
+        # GHL rate limits and outages hit one account at a time, so each location gets its own breaker
+        self.breaker_settings = {
+            "window": int(os.getenv("GHL_BREAKER_WINDOW", "20")),
+            "min_calls": int(os.getenv("GHL_BREAKER_MIN_CALLS", "5")),
+            "failure_threshold": float(os.getenv("GHL_BREAKER_FAILURE_RATE", "0.5")),
+            "slow_call_seconds": float(os.getenv("GHL_BREAKER_SLOW_CALL_SECONDS", "5")),
+            "reset_timeout": float(os.getenv("GHL_BREAKER_RESET_SECONDS", "30")),
+            "half_open_calls": int(os.getenv("GHL_BREAKER_HALF_OPEN_CALLS", "1")),
+        }
+        self.breaker_cache_size = int(os.getenv("GHL_BREAKER_CACHE_SIZE", "1024"))
+        self._breakers: "OrderedDict[Optional[str], CircuitBreaker]" = OrderedDict()
+        self.pipeline_ttl = float(os.getenv("GHL_PIPELINE_TTL_SECONDS", "3600"))
+        self.fallback_pipeline_id = os.getenv("GHL_PIPELINE_ID")
+        self.fallback_stage_id = os.getenv("GHL_STAGE_ID")
+        self.default_account = GHLAccount(
+            self.api_key, self.location_id, self.fallback_pipeline_id, self.fallback_stage_id
+        )
+        # (pipeline_id, stage_id) and fetch time per location, least recently used first
+        self.pipeline_cache_size = int(os.getenv("GHL_PIPELINE_CACHE_SIZE", "1024"))
+        self._pipelines: "OrderedDict[str, Tuple[Tuple[str, str], float]]" = OrderedDict()
+        self._pipeline_locks: Dict[str, asyncio.Lock] = {}
+        self._pipeline_refresh_task: Optional[asyncio.Task] = None
+        self.requests_total = 0
+        self.request_errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
         
         if not self.api_key:
             logger.warning("GHL_API_KEY not found in environment variables")
@@ -23,16 +107,169 @@ class GoHighLevelIntegration:
         else:
             logger.info(f"GHL_LOCATION_ID loaded: {self.location_id}")
     
-    def get_headers(self) -> Dict[str, str]:
+    async def startup(self):
+        """Open the shared, keep-alive HTTP client"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=self.limits,
+                timeout=self.timeout,
+            )
+            logger.info(f"GHL HTTP client started (http2={self.http2})")
+        if self.configured and self._pipeline_refresh_task is None:
+            self._pipeline_refresh_task = asyncio.create_task(self._refresh_pipeline_loop())
+    
+    async def shutdown(self):
+        """Close the shared HTTP client and its pooled connections"""
+        if self._pipeline_refresh_task is not None:
+            self._pipeline_refresh_task.cancel()
+            self._pipeline_refresh_task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def _after_fork(self):
+        # A forked worker must not share the parent's connections or tasks
+        self._client = None
+        self._pipeline_refresh_task = None
+        self._pipeline_locks = {}
+        self._breakers = OrderedDict()
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The shared HTTP client, opened on first use outside the app lifecycle"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(http2=self.http2, limits=self.limits, timeout=self.timeout)
+        return self._client
+    
+    def breaker(self, account: Optional[GHLAccount] = None) -> CircuitBreaker:
+        """The circuit breaker for ``account``'s location, created on first use"""
+        location_id = (account or self.default_account).location_id
+        breaker = self._breakers.get(location_id)
+        if breaker is None:
+            breaker = self._breakers[location_id] = CircuitBreaker(f"ghl:{location_id}", **self.breaker_settings)
+            # Forget the least recently used closed breakers; an open one still has to cool down
+            for key in [key for key, old in self._breakers.items() if old.state == CLOSED]:
+                if len(self._breakers) <= self.breaker_cache_size:
+                    break
+                if key != location_id:
+                    del self._breakers[key]
+        else:
+            self._breakers.move_to_end(location_id)
+        return breaker
+
+    def breaker_stats(self) -> Dict[str, Any]:
+        """Breaker state and counters per location, with totals"""
+        breakers = {location_id: breaker.stats() for location_id, breaker in self._breakers.items()}
+        states = [stats["state"] for stats in breakers.values()]
+        return {
+            "breakers": len(breakers),
+            "open": states.count(OPEN),
+            "half_open": states.count(HALF_OPEN),
+            "rejected_total": sum(stats["rejected_total"] for stats in breakers.values()),
+            "opened_total": sum(stats["opened_total"] for stats in breakers.values()),
+            "locations": breakers,
+        }
+
+    @contextmanager
+    def deadline(self, seconds: float):
+        """Bound every GHL call made inside the block to finish within ``seconds`` in total"""
+        at = time.monotonic() + seconds
+        current = _deadline.get()
+        token = _deadline.set(at if current is None else min(at, current))
+        try:
+            yield
+        finally:
+            _deadline.reset(token)
+    
+    async def request(self, method: str, path: str, operation: str,
+                      account: Optional[GHLAccount] = None, **kwargs) -> httpx.Response:
+        """Send a request to the GHL API over the pooled client with ``account``'s credentials.
+
+        Raises CircuitOpenError without calling out while GHL is failing for
+        the account, and DeadlineExceeded when the call cannot finish within
+        the deadline.
+        """
+        timeout = self.call_deadline
+        deadline = _deadline.get()
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.monotonic())
+            if timeout <= 0:
+                raise DeadlineExceeded(f"No time left for GHL {operation}")
+        breaker = self.breaker(account)
+        breaker.before_call()
+        self.requests_total += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        start = time.perf_counter()
+        status = "error"
+        healthy = False
+        cancelled = False
+        try:
+            response = await asyncio.wait_for(self.client.request(
+                method, f"{self.base_url}{path}", headers=self.get_headers(account), **kwargs
+            ), timeout)
+            status = str(response.status_code)
+            # 4xx is about our request, not GHL's health
+            healthy = response.status_code < 500 and response.status_code != 429
+            return response
+        except asyncio.TimeoutError:
+            self.request_errors += 1
+            status = "timeout"
+            raise DeadlineExceeded(f"GHL {operation} did not finish within {timeout:.1f}s")
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        except Exception:
+            self.request_errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            elapsed = time.perf_counter() - start
+            if cancelled:
+                breaker.release()
+            else:
+                breaker.record(healthy, elapsed)
+            observe_external("ghl", operation, status, elapsed)
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """Connection pool usage counters"""
+        stats = {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "requests_total": self.requests_total,
+            "request_errors": self.request_errors,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "cached_pipelines": len(self._pipelines),
+        }
+        # httpcore does not expose pool state publicly; report it when reachable
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is not None:
+            stats["open_connections"] = len(connections)
+            stats["idle_connections"] = sum(1 for c in connections if c.is_idle())
+        return stats
+    
+    @property
+    def configured(self) -> bool:
+        """Whether both the API key and location ID are set"""
+        return self.default_account.configured
+    
+    def get_headers(self, account: Optional[GHLAccount] = None) -> Dict[str, str]:
         """Get authentication headers for GHL API"""
+        account = account or self.default_account
         return {
-            "Authorization": f"Bearer {self.api_key}",
+            "Authorization": f"Bearer {account.api_key}",
             "Content-Type": "application/json"
         }
     
-    async def create_contact(self, contact_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    async def create_contact(self, contact_data: Dict[str, Any],
+                             account: Optional[GHLAccount] = None) -> Optional[Dict[str, Any]]:
         """Create a new contact in GoHighLevel"""
-        if not self.api_key or not self.location_id:
+        account = account or self.default_account
+        if not account.configured:
             logger.error("GHL API key or location ID not configured")
             return None
         
@@ -41,7 +278,7 @@ class GoHighLevelIntegration:
             "firstName": contact_data.get("name", "").split()[0] if contact_data.get("name") else "",
             "lastName": " ".join(contact_data.get("name", "").split()[1:]) if len(contact_data.get("name", "").split()) > 1 else "",
             "email": contact_data.get("email", ""),
-            "locationId": self.location_id,
+            "locationId": account.location_id,
             "source": "Portfolio Website",
             "tags": ["Website Lead", "Portfolio Contact"]
         }
@@ -51,97 +288,164 @@ class GoHighLevelIntegration:
             ghl_contact["phone"] = contact_data["phone"]
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/contacts/",
-                    headers=self.get_headers(),
-                    json=ghl_contact,
-                    timeout=30.0
-                )
+            response = await self.request("POST", "/contacts/", "create_contact", account, json=ghl_contact)
+            
+            if response.status_code in [200, 201]:
+                logger.info(f"Successfully created GHL contact for {contact_data.get('email')}")
+                return response.json()
+            elif response.status_code == 409:
+                logger.info(f"Contact already exists: {contact_data.get('email')}")
+                return {"id": "existing", "message": "Contact already exists"}
+            else:
+                logger.error(f"Failed to create GHL contact. Status: {response.status_code}, Response: {response.text}")
+                return None
                 
-                if response.status_code in [200, 201]:
-                    logger.info(f"Successfully created GHL contact for {contact_data.get('email')}")
-                    return response.json()
-                elif response.status_code == 409:
-                    logger.info(f"Contact already exists: {contact_data.get('email')}")
-                    return {"id": "existing", "message": "Contact already exists"}
-                else:
-                    logger.error(f"Failed to create GHL contact. Status: {response.status_code}, Response: {response.text}")
-                    return None
-                    
-        except httpx.TimeoutException:
+        except CircuitOpenError:
+            # Let the caller defer the sync instead of counting a failed attempt
+            raise
+        except (httpx.TimeoutException, DeadlineExceeded):
             logger.error("Timeout when creating GHL contact")
             return None
         except Exception as e:
             logger.error(f"Error creating GHL contact: {str(e)}")
             return None
     
-    async def create_opportunity(self, contact_id: str, service_type: str) -> Optional[Dict[str, Any]]:
+    async def fetch_pipeline(self, account: Optional[GHLAccount] = None) -> Optional[Tuple[str, str]]:
+        """Discover the first pipeline and its first stage from the GHL API"""
+        account = account or self.default_account
+        response = await self.request(
+            "GET", "/pipelines/", "list_pipelines", account, params={"locationId": account.location_id}
+        )
+        
+        if response.status_code != 200:
+            logger.error(f"Failed to get pipeline: {response.status_code}")
+            return None
+        
+        pipelines = response.json().get("pipelines", [])
+        if not pipelines:
+            logger.error("No pipelines found")
+            return None
+        
+        pipeline = pipelines[0]
+        stage_id = pipeline["stages"][0]["id"] if pipeline.get("stages") else None
+        if not stage_id:
+            logger.error("No stages found in pipeline")
+            return None
+        return pipeline["id"], stage_id
+    
+    def _cached_pipeline(self, location_id: str, max_age: Optional[float] = None) -> Optional[Tuple[str, str]]:
+        entry = self._pipelines.get(location_id)
+        if entry is None or (max_age is not None and time.monotonic() - entry[1] >= max_age):
+            return None
+        self._pipelines.move_to_end(location_id)
+        return entry[0]
+    
+    async def get_pipeline(self, refresh: bool = False,
+                           account: Optional[GHLAccount] = None) -> Optional[Tuple[str, str]]:
+        """Cached (pipeline_id, stage_id) for ``account``, falling back to its configured IDs"""
+        account = account or self.default_account
+        location_id = account.location_id
+        fresh = None if refresh else self._cached_pipeline(location_id, self.pipeline_ttl)
+        if fresh:
+            return fresh
+        async with self._pipeline_locks.setdefault(location_id, asyncio.Lock()):
+            fresh = None if refresh else self._cached_pipeline(location_id, self.pipeline_ttl)
+            if fresh:
+                return fresh
+            circuit_open = None
+            try:
+                pipeline = await self.fetch_pipeline(account)
+            except CircuitOpenError as e:
+                circuit_open = e
+                pipeline = None
+            except Exception as e:
+                logger.error(f"Error discovering GHL pipeline: {str(e)}")
+                pipeline = None
+            if pipeline:
+                self._pipelines[location_id] = (pipeline, time.monotonic())
+                self._pipelines.move_to_end(location_id)
+                while len(self._pipelines) > self.pipeline_cache_size:
+                    evicted, _ = self._pipelines.popitem(last=False)
+                    self._pipeline_locks.pop(evicted, None)
+                return pipeline
+        cached = self._cached_pipeline(location_id)
+        if cached:
+            # Keep serving the last known pipeline while discovery is failing
+            return cached
+        if account.pipeline_id and account.stage_id:
+            return account.pipeline_id, account.stage_id
+        if circuit_open is not None:
+            raise circuit_open
+        return None
+    
+    def invalidate_pipeline(self, account: Optional[GHLAccount] = None):
+        """Forget the cached pipeline so the next opportunity rediscovers it"""
+        self._pipelines.pop((account or self.default_account).location_id, None)
+    
+    async def _refresh_pipeline_loop(self):
+        """Warm the default account's pipeline cache, then refresh it ahead of expiry"""
+        refresh = False
+        while True:
+            try:
+                await self.get_pipeline(refresh=refresh)
+            except CircuitOpenError as e:
+                logger.warning(f"Skipping GHL pipeline refresh: {str(e)}")
+            refresh = True
+            await asyncio.sleep(max(self.pipeline_ttl * 0.8, 1.0))
+    
+    async def create_opportunity(self, contact_id: str, service_type: str,
+                                 account: Optional[GHLAccount] = None) -> Optional[Dict[str, Any]]:
         """Create an opportunity for the contact based on service type"""
-        if not self.api_key or not self.location_id:
+        account = account or self.default_account
+        if not account.configured:
             return None
         
         try:
-            async with httpx.AsyncClient() as client:
-                pipeline_response = await client.get(
-                    f"{self.base_url}/pipelines/",
-                    headers=self.get_headers(),
-                    params={"locationId": self.location_id},
-                    timeout=30.0
-                )
-                
-                if pipeline_response.status_code != 200:
-                    logger.error(f"Failed to get pipeline: {pipeline_response.status_code}")
-                    return None
-                
-                pipelines = pipeline_response.json().get("pipelines", [])
-                if not pipelines:
-                    logger.error("No pipelines found")
-                    return None
-                
-                pipeline = pipelines[0]
-                pipeline_id = pipeline["id"]
-                stage_id = pipeline["stages"][0]["id"] if pipeline.get("stages") else None
-                
-                if not stage_id:
-                    logger.error("No stages found in pipeline")
-                    return None
-                
-                # Map service types to opportunity values
-                service_values = {
-                    "Strategic Consulting": 5000,
-                    "Regulatory Navigation Support": 3000,
-                    "Transformation Coaching": 2500,
-                    "Innovative Financial Strategies": 4000,
-                    "Business System Optimization": 3500,
-                    "General Inquiry": 1000
-                }
-                
-                opportunity_data = {
-                    "title": f"{service_type} - Portfolio Inquiry",
-                    "pipelineId": pipeline_id,
-                    "locationId": self.location_id,
-                    "stageId": stage_id,
-                    "status": "open",
-                    "source": "Portfolio Website",
-                    "monetaryValue": service_values.get(service_type, 1000),
-                    "contactId": contact_id
-                }
-                
-                opportunity_response = await client.post(
-                    f"{self.base_url}/pipelines/{pipeline_id}/opportunities/",
-                    headers=self.get_headers(),
-                    json=opportunity_data,
-                    timeout=30.0
-                )
+            pipeline = await self.get_pipeline(account=account)
+            if not pipeline:
+                logger.error("No pipeline/stage available for opportunity")
+                return None
+            pipeline_id, stage_id = pipeline
+            
+            opportunity_data = {
+                "title": f"{service_type} - Portfolio Inquiry",
+                "pipelineId": pipeline_id,
+                "locationId": account.location_id,
+                "stageId": stage_id,
+                "status": "open",
+                "source": "Portfolio Website",
+                "monetaryValue": SERVICE_VALUES.get(service_type, DEFAULT_SERVICE_VALUE),
+                "contactId": contact_id
+            }
+            
+            opportunity_response = await self.request(
+                "POST", f"/pipelines/{pipeline_id}/opportunities/", "create_opportunity", account,
+                json=opportunity_data
+            )
+            
+            if (opportunity_response.status_code in STALE_PIPELINE_STATUSES
+                    and self._cached_pipeline(account.location_id) == pipeline):
+                # The cached pipeline or stage was deleted or renamed; rediscover once
+                logger.warning(f"Pipeline {pipeline_id} rejected ({opportunity_response.status_code}), refreshing pipeline cache")
+                self.invalidate_pipeline(account)
+                fresh = await self.get_pipeline(account=account)
+                if fresh and fresh != pipeline:
+                    pipeline_id, stage_id = fresh
+                    opportunity_data.update(pipelineId=pipeline_id, stageId=stage_id)
+                    opportunity_response = await self.request(
+                        "POST", f"/pipelines/{pipeline_id}/opportunities/", "create_opportunity", account,
+                        json=opportunity_data
+                    )
+            
+            if opportunity_response.status_code in [200, 201]:
+                logger.info(f"Created opportunity for contact {contact_id} in pipeline {pipeline_id}")
+                return opportunity_response.json()
+            else:
+                logger.error(f"Failed to create opportunity: {opportunity_response.status_code} - {opportunity_response.text}")
+                return None
                 
-                if opportunity_response.status_code in [200, 201]:
-                    logger.info(f"Created opportunity for contact {contact_id} in pipeline {pipeline_id}")
-                    return opportunity_response.json()
-                else:
-                    logger.error(f"Failed to create opportunity: {opportunity_response.status_code} - {opportunity_response.text}")
-                    return None
-                    
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"Error creating opportunity: {str(e)}")
             
@@ -149,3 +453,5 @@ class GoHighLevelIntegration:
 
 # Initialize the integration
 ghl_integration = GoHighLevelIntegration()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=ghl_integration._after_fork)
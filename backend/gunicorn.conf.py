@@ -0,0 +1,30 @@
+"""Gunicorn settings for running the API on every core:
+
+    cd backend && gunicorn server:app
+
+Each worker is its own process with its own event loop, Mongo client and
+GoHighLevel HTTP client, all opened after the fork. Startup seeding is
+serialized by a Mongo lock, and cache invalidations reach every worker
+through change streams or, on standalone Mongo, the cache_events broadcast.
+"""
+import multiprocessing
+import os
+
+_here = os.path.dirname(os.path.abspath(__file__))
+# server.py and models.py live in nested directories
+pythonpath = ",".join([_here, os.path.join(_here, "backend"), os.path.join(_here, "backend", "backend")])
+
+bind = os.environ.get("BIND", f"0.0.0.0:{os.environ.get('PORT', '8001')}")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Let in-flight requests and outbox jobs finish on restart
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.environ.get("WORKER_TIMEOUT", "60"))
+keepalive = 5
+# Safe either way: connections are only opened inside workers
+preload_app = os.environ.get("GUNICORN_PRELOAD", "false").lower() == "true"
+
+
+def when_ready(server):
+    if workers > 1 and os.environ.get("RATE_LIMIT_BACKEND", "memory") == "memory":
+        server.log.warning("RATE_LIMIT_BACKEND=memory limits each worker separately; use mongo or redis")
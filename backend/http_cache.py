@@ -0,0 +1,70 @@
+import os
+from typing import Dict, Iterable, Optional
+
+from fastapi import Request, Response
+
+from snapshot import EncodedPayload
+
+DEFAULT_CACHE_CONTROL = os.environ.get(
+    "CACHE_CONTROL_DEFAULT", "public, max-age=60, stale-while-revalidate=600"
+)
+
+
+def cache_control_for(route: str) -> str:
+    """Cache-Control for ``route``, overridable with CACHE_CONTROL_<ROUTE>"""
+    return os.environ.get(f"CACHE_CONTROL_{route.upper()}", DEFAULT_CACHE_CONTROL)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against ``etag`` (RFC 9110)"""
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def choose_encoding(accept_encoding: str, available: Iterable[str]) -> Optional[str]:
+    """The first of ``available`` content-codings that ``accept_encoding`` allows"""
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        accepted[coding.strip()] = quality
+    for coding in available:
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+
+def conditional_response(request: Request, payload: EncodedPayload, route: str) -> Response:
+    """Serve ``payload`` with validators, answering a matching If-None-Match with 304.
+
+    The body is sent in the best precompressed variant the client accepts;
+    each variant has its own ETag, derived from the identity one.
+    """
+    coding = choose_encoding(request.headers.get("accept-encoding", ""), payload.encoded)
+    etag = payload.etag if coding is None else f'{payload.etag[:-1]}-{coding}"'
+    headers: Dict[str, str] = {
+        "ETag": etag,
+        "Cache-Control": cache_control_for(route),
+        # The body depends on the tenant, which the header can select
+        "Vary": "Accept-Encoding, X-Tenant",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (etag_matches(if_none_match, etag) or etag_matches(if_none_match, payload.etag)):
+        return Response(status_code=304, headers=headers)
+    if coding is None:
+        return Response(content=payload.body, media_type="application/json", headers=headers)
+    headers["Content-Encoding"] = coding
+    return Response(content=payload.encoded[coding], media_type="application/json", headers=headers)
@@ -0,0 +1,167 @@
+"""Declarative index registry and query plan verification.
+
+Run ``python indexes.py`` to apply the registry, or ``python indexes.py --check``
+to also explain every DatabaseManager query and fail if one scans a
+collection or sorts in memory.
+"""
+import asyncio
+import logging
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, IndexModel
+
+from database import (
+    db, DEFAULT_TENANT, SINGLETON_SORT, ORDER_SORT, SKILL_SORT, EDITABLE_CONTENT, FEATURED_QUERY, CONTACT_MESSAGE_SORT,
+    tenant_filter, contact_message_filter, encode_cursor, decode_cursor,
+)
+from outbox import GHLOutbox, OUTBOX_CLAIM_SORT, SWEEP_SORT
+
+logger = logging.getLogger(__name__)
+
+# Indexes per collection; _id is always indexed and needs no entry.
+# Every tenant-scoped query filters on tenant_id, so it leads each index.
+TENANT = [("tenant_id", ASCENDING)]
+# Admin content edits address documents by their string id
+CONTENT_ID = [("id", ASCENDING)]
+INDEXES: Dict[str, List[IndexModel]] = {
+    "profile": [
+        IndexModel(TENANT + SINGLETON_SORT, name="tenant_id__id"),
+    ],
+    "about": [
+        IndexModel(TENANT + SINGLETON_SORT, name="tenant_id__id"),
+    ],
+    "skills": [
+        IndexModel(TENANT + SKILL_SORT, name="tenant_id_order__id"),
+        IndexModel(TENANT + CONTENT_ID, name="tenant_id_id"),
+    ],
+    "experience": [
+        IndexModel(TENANT + ORDER_SORT, name="tenant_id_order"),
+        IndexModel(TENANT + CONTENT_ID, name="tenant_id_id"),
+    ],
+    "projects": [
+        IndexModel(TENANT + [("featured", ASCENDING)] + ORDER_SORT, name="tenant_id_featured_order"),
+        IndexModel(TENANT + CONTENT_ID, name="tenant_id_id"),
+    ],
+    "testimonials": [
+        IndexModel(TENANT + [("featured", ASCENDING)] + ORDER_SORT, name="tenant_id_featured_order"),
+        IndexModel(TENANT + CONTENT_ID, name="tenant_id_id"),
+    ],
+    "contact_messages": [
+        IndexModel(TENANT + CONTACT_MESSAGE_SORT, name="tenant_id_created_at_id"),
+        IndexModel(TENANT + [("status", ASCENDING)] + CONTACT_MESSAGE_SORT, name="tenant_id_status_created_at_id"),
+        IndexModel(TENANT + [("service_type", ASCENDING)] + CONTACT_MESSAGE_SORT,
+                   name="tenant_id_service_type_created_at_id"),
+        # Outbox sweep for messages whose sync job was never written
+        IndexModel([("ghl_sync_status", ASCENDING), ("created_at", ASCENDING)], name="ghl_sync_status_created_at"),
+    ],
+    "contact_rollups": [
+        IndexModel(TENANT + [("day", ASCENDING)], name="tenant_id_day"),
+    ],
+    "ghl_outbox": [
+        # Serves both branches of the claim query, merged in next_attempt_at order
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING), ("locked_until", ASCENDING)],
+                   name="status_next_attempt_at_locked_until"),
+    ],
+    "tenants": [
+        IndexModel([("hosts", ASCENDING)], name="hosts", unique=True, sparse=True),
+    ],
+    # Shared rate limiter state (RATE_LIMIT_BACKEND=mongo); idle buckets are long since full
+    "rate_limits": [
+        IndexModel([("updated_at", ASCENDING)], name="updated_at_ttl", expireAfterSeconds=86400),
+    ],
+    "contact_dedup": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    # Cross-process locks (locks.py); an expired lease is free either way
+    "locks": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+# Stages that mean a query is not served by an index
+BAD_STAGES = {"COLLSCAN", "SORT"}
+
+
+def registered_queries() -> List[Tuple[str, str, Dict[str, Any], Optional[list]]]:
+    """Every query shape DatabaseManager issues, as (label, collection, filter, sort)"""
+    sample_cursor = decode_cursor(encode_cursor({"created_at": datetime.utcnow(), "_id": ObjectId()}))
+    tenant = tenant_filter(DEFAULT_TENANT)
+    return [
+        ("get_profile", "profile", tenant, SINGLETON_SORT),
+        ("get_about", "about", tenant, SINGLETON_SORT),
+        ("get_skills", "skills", tenant, SKILL_SORT),
+        ("get_experience", "experience", tenant, ORDER_SORT),
+        ("get_projects", "projects", tenant_filter(DEFAULT_TENANT, FEATURED_QUERY), ORDER_SORT),
+        ("get_testimonials", "testimonials", tenant_filter(DEFAULT_TENANT, FEATURED_QUERY), ORDER_SORT),
+        ("get_contact_messages", "contact_messages", tenant, CONTACT_MESSAGE_SORT),
+        ("list_contact_messages", "contact_messages", {**tenant, **sample_cursor}, CONTACT_MESSAGE_SORT),
+        ("list_contact_messages(status)", "contact_messages",
+         {**contact_message_filter(DEFAULT_TENANT, status="new"), **sample_cursor}, CONTACT_MESSAGE_SORT),
+        ("list_contact_messages(service_type)", "contact_messages",
+         {**contact_message_filter(DEFAULT_TENANT, service_type="General Inquiry"), **sample_cursor},
+         CONTACT_MESSAGE_SORT),
+        *((f"update_content({collection})", collection, tenant_filter(DEFAULT_TENANT, {"id": "sample"}), None)
+          for collection in EDITABLE_CONTENT),
+        ("contact_analytics", "contact_rollups",
+         tenant_filter(DEFAULT_TENANT, {"day": {"$gte": datetime(2024, 1, 1), "$lt": datetime.utcnow()}}), None),
+        ("outbox claim", "ghl_outbox", GHLOutbox.claim_query(datetime.utcnow()), OUTBOX_CLAIM_SORT),
+        ("outbox sweep", "contact_messages", GHLOutbox.sweep_query(datetime.utcnow()), SWEEP_SORT),
+    ]
+
+
+async def ensure_indexes():
+    """Create every registered index; identical indexes are left alone"""
+    for collection, models in INDEXES.items():
+        if models:
+            await db[collection].create_indexes(models)
+    logger.info(f"Ensured indexes on {len(INDEXES)} collections")
+
+
+def plan_stages(plan: Any) -> Set[str]:
+    """Collect every stage name in an explain() plan tree"""
+    stages: Set[str] = set()
+    if isinstance(plan, dict):
+        if isinstance(plan.get("stage"), str):
+            stages.add(plan["stage"])
+        for value in plan.values():
+            stages |= plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            stages |= plan_stages(value)
+    return stages
+
+
+async def verify_query_plans() -> List[str]:
+    """Explain each registered query; return a description of every bad plan"""
+    problems = []
+    for label, collection, query, sort in registered_queries():
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.limit(100).explain()
+        winning = explain.get("queryPlanner", {}).get("winningPlan", {})
+        bad = plan_stages(winning) & BAD_STAGES
+        if bad:
+            problems.append(f"{label} on {collection}: {', '.join(sorted(bad))}")
+    return problems
+
+
+async def check():
+    """Apply the registry and raise if any query plan is unindexed"""
+    await ensure_indexes()
+    problems = await verify_query_plans()
+    if problems:
+        raise RuntimeError("Unindexed queries: " + "; ".join(problems))
+    logger.info("All registered queries are served by indexes")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(check() if "--check" in sys.argv else ensure_indexes())
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
@@ -0,0 +1,222 @@
+import bisect
+import contextvars
+import cProfile
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import config  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: with this off the decorators return the function untouched
+ENABLED = os.environ.get("INSTRUMENTATION_ENABLED", "false").lower() == "true"
+PROFILE_SAMPLE_RATE = int(os.environ.get("PROFILE_SAMPLE_RATE", "0"))  # 1-in-N requests, 0 disables
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", "250"))
+PROFILE_DIR = Path(os.environ.get("PROFILE_DIR", "/tmp/portfolio-profiles"))
+PROFILER = os.environ.get("PROFILER", "cprofile")  # cprofile or pyinstrument
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram keyed by label values"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...], buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *label_values: str):
+        series = self._series.get(label_values)
+        if series is None:
+            # One count per bucket, then +Inf count and sum
+            series = self._series[label_values] = [0.0] * (len(self.buckets) + 2)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, series in sorted(self._series.items()):
+            labels = ",".join(f'{k}="{v}"' for k, v in zip(self.labels, label_values))
+            prefix = f"{labels}," if labels else ""
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative:g}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {cumulative:g}')
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative:g}")
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-1]:.6f}")
+        return lines
+
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Request latency by route", ("method", "route", "status")
+)
+db_operation_duration = Histogram(
+    "db_operation_duration_seconds", "DatabaseManager operation latency", ("operation",)
+)
+external_call_duration = Histogram(
+    "external_call_duration_seconds", "Outbound call latency", ("service", "operation", "status")
+)
+serialize_duration = Histogram(
+    "serialize_duration_seconds", "Response encoding latency", ("payload",)
+)
+
+# Extra text exposition sources (cache counters, pool gauges, ...)
+_gauge_sources: List[Callable[[], Dict[str, float]]] = []
+
+# Per-request span totals feeding the Server-Timing header
+_spans: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("spans", default=None)
+
+
+def add_gauge_source(source: Callable[[], Dict[str, float]]):
+    """Register a callable returning ``{metric_name: value}`` to expose on /metrics"""
+    _gauge_sources.append(source)
+
+
+def record_span(category: str, duration: float):
+    """Add ``duration`` to the current request's Server-Timing ``category``"""
+    spans = _spans.get()
+    if spans is not None:
+        spans[category] = spans.get(category, 0.0) + duration
+
+
+@contextmanager
+def span(category: str, histogram: Histogram, *label_values: str):
+    """Time a block into ``histogram`` and the current request's Server-Timing"""
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        histogram.observe(duration, *label_values)
+        record_span(category, duration)
+
+
+def timed_db(func: Callable):
+    """Time an async DatabaseManager operation"""
+    if not ENABLED:
+        return func
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        with span("db", db_operation_duration, func.__name__):
+            return await func(*args, **kwargs)
+    return wrapper
+
+
+def observe_external(service: str, operation: str, status: str, duration: float):
+    """Record one outbound call"""
+    if ENABLED:
+        external_call_duration.observe(duration, service, operation, status)
+        record_span(service, duration)
+
+
+def render_metrics() -> str:
+    """Prometheus text exposition of every metric"""
+    lines: List[str] = []
+    for histogram in (http_request_duration, db_operation_duration, external_call_duration, serialize_duration):
+        lines.extend(histogram.render())
+    for source in _gauge_sources:
+        try:
+            for name, value in source().items():
+                lines.append(f"{name} {float(value):g}")
+        except Exception as e:
+            logger.error(f"Metrics source failed: {str(e)}")
+    return "\n".join(lines) + "\n"
+
+
+class _SampledProfiler:
+    """Profiles 1-in-N requests and keeps the profile only if the request was slow"""
+
+    def __init__(self):
+        self.active = False
+
+    def start(self) -> Optional[Any]:
+        if self.active or PROFILE_SAMPLE_RATE <= 0 or random.randrange(PROFILE_SAMPLE_RATE):
+            return None
+        # One profile at a time: the profiler sees every task on the event loop
+        self.active = True
+        if PROFILER == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+                profiler = Profiler(async_mode="enabled")
+                profiler.start()
+                return profiler
+            except ImportError:
+                logger.warning("pyinstrument not installed; falling back to cProfile")
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def stop(self, profiler: Any, route: str, duration: float):
+        self.active = False
+        if isinstance(profiler, cProfile.Profile):
+            profiler.disable()
+        else:
+            profiler.stop()
+        if duration * 1000 < PROFILE_SLOW_MS:
+            return
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        stem = f"{int(time.time() * 1000)}-{route.strip('/').replace('/', '_') or 'root'}-{duration * 1000:.0f}ms"
+        if isinstance(profiler, cProfile.Profile):
+            path = PROFILE_DIR / f"{stem}.prof"
+            profiler.dump_stats(str(path))
+        else:
+            path = PROFILE_DIR / f"{stem}.html"
+            path.write_text(profiler.output_html())
+        logger.info(f"Saved slow request profile {path}")
+
+
+class InstrumentationMiddleware:
+    """ASGI middleware recording request latency histograms and Server-Timing headers"""
+
+    def __init__(self, app):
+        self.app = app
+        self.profiler = _SampledProfiler()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        spans: Dict[str, float] = {}
+        token = _spans.set(spans)
+        start = time.perf_counter()
+        status = 500
+        profile = self.profiler.start()
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                total = time.perf_counter() - start
+                timing = [f"{name};dur={value * 1000:.2f}" for name, value in spans.items()]
+                timing.append(f"total;dur={total * 1000:.2f}")
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"server-timing", ", ".join(timing).encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            duration = time.perf_counter() - start
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            http_request_duration.observe(duration, scope["method"], route, str(status))
+            if profile is not None:
+                self.profiler.stop(profile, route, duration)
+            _spans.reset(token)
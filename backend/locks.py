@@ -0,0 +1,63 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from database import locks_collection
+
+logger = logging.getLogger(__name__)
+
+
+class LockTimeout(Exception):
+    """The lock was still held by someone else when the wait ran out"""
+
+
+def lock_owner() -> str:
+    """Identifies this process among the workers of every host"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+async def try_acquire(name: str, owner: str, ttl: float) -> bool:
+    """Take ``name`` if it is free or its holder's lease has run out"""
+    now = datetime.utcnow()
+    try:
+        # Matches only a free (expired) lock; upserting a held one hits the _id and fails
+        await locks_collection.update_one(
+            {"_id": name, "expires_at": {"$lte": now}},
+            {"$set": {"owner": owner, "acquired_at": now, "expires_at": now + timedelta(seconds=ttl)}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+@asynccontextmanager
+async def mongo_lock(name: str, ttl: float = 300.0, wait: Optional[float] = None, poll: float = 0.5):
+    """Hold a lock shared by every process using this database.
+
+    The lease lasts ``ttl`` seconds so a crashed holder cannot block others
+    forever; keep the guarded work well inside it. Waits up to ``wait``
+    seconds (forever when None) before raising LockTimeout.
+    """
+    owner = lock_owner()
+    deadline = None if wait is None else time.monotonic() + wait
+    waited = False
+    while not await try_acquire(name, owner, ttl):
+        if deadline is not None and time.monotonic() >= deadline:
+            raise LockTimeout(f"Lock {name} is held by another process")
+        if not waited:
+            logger.info(f"Waiting for lock {name}")
+            waited = True
+        await asyncio.sleep(poll if deadline is None else max(0.0, min(poll, deadline - time.monotonic())))
+    try:
+        yield
+    finally:
+        await locks_collection.delete_one({"_id": name, "owner": owner})
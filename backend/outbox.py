@@ -0,0 +1,370 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from database import DatabaseManager, ghl_outbox_collection, contact_messages_collection, DEFAULT_TENANT
+from circuit_breaker import CircuitOpenError
+from ghl_integration import GHLAccount, ghl_integration
+from locks import LockTimeout, mongo_lock
+from tenants import ghl_account
+
+logger = logging.getLogger(__name__)
+
+
+OUTBOX_CLAIM_SORT = [("next_attempt_at", ASCENDING)]
+SWEEP_SORT = [("created_at", ASCENDING)]
+# The ContactMessageCreate fields a sync job carries
+PAYLOAD_FIELDS = ("name", "email", "subject", "message", "service_type")
+
+
+class SyncError(Exception):
+    """A GoHighLevel sync step failed and should be retried"""
+
+
+def extract_contact_id(ghl_contact: Dict[str, Any]) -> Optional[str]:
+    """Pull the contact id out of either GHL response format"""
+    if ghl_contact.get("contact", {}).get("id"):
+        return ghl_contact["contact"]["id"]
+    return ghl_contact.get("id")
+
+
+class GHLOutbox:
+    """Mongo-backed outbox that syncs contact messages to GoHighLevel.
+
+    Each job is keyed by an idempotency key derived from the contact message
+    id, so enqueueing twice is harmless. Workers claim jobs with a lease,
+    record progress after each GHL call so a retry never creates the same
+    contact twice, back off exponentially on failure and dead-letter a job
+    after ``max_attempts``. A sync gets ``sync_deadline`` seconds in total;
+    while the circuit breaker for a job's GHL account is open, the job is
+    deferred until it lets calls through, without using up an attempt.
+
+    Every ``sweep_interval`` seconds one process re-enqueues contact messages
+    still pending ``sweep_grace`` seconds after they were stored with no job,
+    which is what a failed enqueue leaves behind.
+    """
+
+    def __init__(self, workers: int = 2, max_attempts: int = 8, base_delay: float = 5.0,
+                 max_delay: float = 3600.0, lease_seconds: float = 120.0, poll_interval: float = 5.0,
+                 sync_deadline: float = 30.0, sweep_interval: float = 300.0, sweep_grace: float = 60.0,
+                 stats_ttl: float = 30.0):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        # Well inside the lease, so no other worker reclaims a job mid-sync
+        self.sync_deadline = min(sync_deadline, lease_seconds / 2)
+        self.sweep_interval = sweep_interval
+        self.sweep_grace = sweep_grace
+        self.stats_ttl = stats_ttl
+        self.swept = 0
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stats: Optional[Dict[str, int]] = None
+        self._stats_at = 0.0
+
+    @staticmethod
+    def _job(message_id: str, contact_data: Dict[str, Any], tenant_id: str) -> Dict[str, Any]:
+        now = datetime.utcnow()
+        return {
+            "_id": f"contact:{message_id}",
+            "message_id": message_id,
+            "tenant_id": tenant_id,
+            "payload": contact_data,
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "locked_until": None,
+            "ghl_contact_id": None,
+            "ghl_opportunity_id": None,
+            "last_error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+
+    async def enqueue(self, message_id: str, contact_data: Dict[str, Any], tenant_id: str = DEFAULT_TENANT) -> str:
+        """Record a sync job for a stored contact message"""
+        job = self._job(message_id, contact_data, tenant_id)
+        try:
+            await ghl_outbox_collection.insert_one(job)
+        except DuplicateKeyError:
+            logger.info(f"GHL sync job already queued: {job['_id']}")
+        self._wake()
+        return job["_id"]
+
+    async def enqueue_many(self, items: List[Tuple[str, Dict[str, Any]]], tenant_id: str = DEFAULT_TENANT):
+        """Record sync jobs for many stored contact messages in one unordered write"""
+        try:
+            await ghl_outbox_collection.insert_many(
+                [self._job(message_id, contact_data, tenant_id) for message_id, contact_data in items],
+                ordered=False
+            )
+        except BulkWriteError as e:
+            # Duplicate keys are jobs that were already queued
+            errors = [err for err in e.details.get("writeErrors", []) if err.get("code") != 11000]
+            if errors:
+                raise
+        self._wake()
+
+    def _wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self):
+        """Start the worker pool"""
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker(n)) for n in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._sweeper()))
+        logger.info(f"Started {self.workers} GHL outbox workers")
+
+    async def stop(self):
+        """Stop the worker pool; claimed jobs are picked up again after their lease"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def stats(self, refresh: bool = False) -> Dict[str, int]:
+        """Job counts per status, recounted at most every ``stats_ttl`` seconds unless ``refresh``"""
+        if refresh or self._stats is None or time.monotonic() - self._stats_at >= self.stats_ttl:
+            counts = await ghl_outbox_collection.aggregate([
+                {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+            ]).to_list(None)
+            self._stats = {row["_id"]: row["count"] for row in counts}
+            self._stats_at = time.monotonic()
+        return self._stats
+
+    @staticmethod
+    def sweep_query(cutoff: datetime) -> Dict[str, Any]:
+        """Filter for contact messages that should have a sync job by now"""
+        return {"ghl_sync_status": "pending", "created_at": {"$lt": cutoff}}
+
+    async def sweep(self, batch_size: int = 500) -> int:
+        """Enqueue jobs for pending contact messages that have none; returns how many"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.sweep_grace)
+        cursor = contact_messages_collection.find(
+            self.sweep_query(cutoff), projection={"tenant_id": 1, **{field: 1 for field in PAYLOAD_FIELDS}}
+        ).sort(SWEEP_SORT).batch_size(batch_size)
+        enqueued = 0
+        batch: List[Dict[str, Any]] = []
+        async for message in cursor:
+            batch.append(message)
+            if len(batch) >= batch_size:
+                enqueued += await self._enqueue_orphans(batch)
+                batch = []
+        if batch:
+            enqueued += await self._enqueue_orphans(batch)
+        if enqueued:
+            logger.warning(f"Re-enqueued {enqueued} contact messages that had no GHL sync job")
+        self.swept += enqueued
+        return enqueued
+
+    async def _enqueue_orphans(self, messages: List[Dict[str, Any]]) -> int:
+        job_ids = [f"contact:{message['_id']}" for message in messages]
+        queued = {job["_id"] for job in await ghl_outbox_collection.find(
+            {"_id": {"$in": job_ids}}, projection={"_id": 1}
+        ).to_list(None)}
+        by_tenant: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+        for message, job_id in zip(messages, job_ids):
+            if job_id not in queued:
+                payload = {field: message.get(field) for field in PAYLOAD_FIELDS}
+                by_tenant.setdefault(message.get("tenant_id", DEFAULT_TENANT), []).append((str(message["_id"]), payload))
+        for tenant_id, items in by_tenant.items():
+            await self.enqueue_many(items, tenant_id)
+        return sum(len(items) for items in by_tenant.values())
+
+    async def _sweeper(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval * random.uniform(0.9, 1.1))
+            try:
+                # One process sweeps at a time; the others skip this round
+                async with mongo_lock("outbox_sweep", ttl=self.sweep_interval, wait=0):
+                    await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except LockTimeout:
+                pass
+            except Exception as e:
+                logger.error(f"GHL outbox sweep failed: {str(e)}")
+
+    async def _worker(self, n: int):
+        while True:
+            try:
+                job = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"GHL outbox worker {n} failed to claim a job: {str(e)}")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                # Not wait_for: it swallows a cancel that lands just as the event is set
+                wakeup = asyncio.ensure_future(self._wakeup.wait())
+                try:
+                    await asyncio.wait({wakeup}, timeout=self.poll_interval)
+                finally:
+                    wakeup.cancel()
+                continue
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The lease expires and another worker retries the job
+                logger.error(f"GHL outbox worker {n} failed to record job {job['_id']}: {str(e)}")
+
+    @staticmethod
+    def claim_query(now: datetime) -> Dict[str, Any]:
+        """Filter for jobs that are due, or whose worker died mid-sync"""
+        return {"$or": [
+            {"status": "pending", "next_attempt_at": {"$lte": now}},
+            {"status": "processing", "locked_until": {"$lte": now}},
+        ]}
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        return await ghl_outbox_collection.find_one_and_update(
+            self.claim_query(now),
+            {"$set": {
+                "status": "processing",
+                "locked_until": now + timedelta(seconds=self.lease_seconds),
+                "updated_at": now,
+            }},
+            sort=OUTBOX_CLAIM_SORT,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _run(self, job: Dict[str, Any]):
+        # Jobs queued before multi-tenancy have no tenant_id and belong to the default tenant
+        account = await ghl_account(job.get("tenant_id"))
+        if not account.configured:
+            await self._finish(job, "skipped", "skipped")
+            return
+        wait = ghl_integration.breaker(account).retry_after()
+        if wait > 0:
+            # GHL is failing for this account; other accounts' jobs keep flowing
+            await self._defer(job, wait, f"GHL circuit for location {account.location_id} is open")
+            return
+        try:
+            with ghl_integration.deadline(self.sync_deadline):
+                await self._sync(job, account)
+        except asyncio.CancelledError:
+            raise
+        except CircuitOpenError as e:
+            await self._defer(job, e.retry_after, str(e))
+        except Exception as e:
+            await self._fail(job, str(e))
+        else:
+            await self._finish(job, "done", "synced")
+
+    async def _sync(self, job: Dict[str, Any], account: GHLAccount):
+        payload = job["payload"]
+        contact_id = job.get("ghl_contact_id")
+        if not contact_id:
+            ghl_contact = await ghl_integration.create_contact(payload, account)
+            contact_id = extract_contact_id(ghl_contact) if ghl_contact else None
+            if not contact_id:
+                raise SyncError(f"Failed to create GHL contact for {payload.get('email')}")
+            await self._progress(job, ghl_contact_id=contact_id)
+
+        if not job.get("ghl_opportunity_id"):
+            opportunity = await ghl_integration.create_opportunity(contact_id, payload.get("service_type"), account)
+            if not opportunity:
+                raise SyncError(f"Failed to create opportunity for contact {contact_id}")
+            opportunity_id = opportunity.get("id") or opportunity.get("opportunity", {}).get("id") or "created"
+            await self._progress(job, ghl_opportunity_id=opportunity_id)
+
+    async def _progress(self, job: Dict[str, Any], **fields):
+        job.update(fields)
+        await ghl_outbox_collection.update_one(
+            {"_id": job["_id"]},
+            {"$set": {**fields, "updated_at": datetime.utcnow()}}
+        )
+
+    async def _fail(self, job: Dict[str, Any], error: str):
+        attempts = job.get("attempts", 0) + 1
+        now = datetime.utcnow()
+        if attempts >= self.max_attempts:
+            logger.error(f"GHL sync job {job['_id']} dead-lettered after {attempts} attempts: {error}")
+            await ghl_outbox_collection.update_one(
+                {"_id": job["_id"]},
+                {"$set": {"status": "dead", "attempts": attempts, "last_error": error,
+                          "locked_until": None, "updated_at": now}}
+            )
+            await self._record_status(job, "failed", error)
+            return
+
+        delay = min(self.base_delay * (2 ** (attempts - 1)), self.max_delay)
+        delay *= random.uniform(0.8, 1.2)
+        logger.warning(f"GHL sync job {job['_id']} attempt {attempts} failed, retrying in {delay:.0f}s: {error}")
+        await ghl_outbox_collection.update_one(
+            {"_id": job["_id"]},
+            {"$set": {"status": "pending", "attempts": attempts, "last_error": error,
+                      "next_attempt_at": now + timedelta(seconds=delay),
+                      "locked_until": None, "updated_at": now}}
+        )
+        await self._record_status(job, "retrying", error)
+
+    async def _defer(self, job: Dict[str, Any], delay: float, reason: str):
+        """Put a job back without counting an attempt"""
+        now = datetime.utcnow()
+        delay *= random.uniform(1.0, 1.2)
+        logger.info(f"GHL sync job {job['_id']} deferred {delay:.0f}s: {reason}")
+        await ghl_outbox_collection.update_one(
+            {"_id": job["_id"]},
+            {"$set": {"status": "pending", "last_error": reason,
+                      "next_attempt_at": now + timedelta(seconds=delay),
+                      "locked_until": None, "updated_at": now}}
+        )
+
+    async def _finish(self, job: Dict[str, Any], status: str, sync_status: str):
+        await ghl_outbox_collection.update_one(
+            {"_id": job["_id"]},
+            {"$set": {"status": status, "locked_until": None, "last_error": None,
+                      "updated_at": datetime.utcnow()}}
+        )
+        await self._record_status(job, sync_status)
+        logger.info(f"GHL sync job {job['_id']} {status}")
+
+    async def _record_status(self, job: Dict[str, Any], sync_status: str, error: Optional[str] = None):
+        """Mirror the sync outcome onto the ContactMessage document and its analytics rollup"""
+        now = datetime.utcnow()
+        fields = {
+            "ghl_sync_status": sync_status,
+            "ghl_sync_error": error,
+            "ghl_contact_id": job.get("ghl_contact_id"),
+            "updated_at": now,
+        }
+        if sync_status == "synced":
+            fields["ghl_synced_at"] = now
+        before = await contact_messages_collection.find_one_and_update(
+            {"_id": ObjectId(job["message_id"])},
+            {"$set": fields},
+            projection={"tenant_id": 1, "created_at": 1, "service_type": 1, "ghl_sync_status": 1},
+        )
+        if before:
+            await DatabaseManager.record_contact_status_change(before, "ghl_sync_status", sync_status)
+
+
+ghl_outbox = GHLOutbox(
+    workers=int(os.environ.get("GHL_OUTBOX_WORKERS", "2")),
+    max_attempts=int(os.environ.get("GHL_OUTBOX_MAX_ATTEMPTS", "8")),
+    base_delay=float(os.environ.get("GHL_OUTBOX_BASE_DELAY_SECONDS", "5")),
+    max_delay=float(os.environ.get("GHL_OUTBOX_MAX_DELAY_SECONDS", "3600")),
+    lease_seconds=float(os.environ.get("GHL_OUTBOX_LEASE_SECONDS", "120")),
+    sync_deadline=float(os.environ.get("GHL_SYNC_DEADLINE_SECONDS", "30")),
+    sweep_interval=float(os.environ.get("GHL_OUTBOX_SWEEP_SECONDS", "300")),
+    stats_ttl=float(os.environ.get("GHL_OUTBOX_STATS_TTL_SECONDS", "30")),
+)
@@ -0,0 +1,241 @@
+import hashlib
+import logging
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+import config  # noqa: F401
+from database import rate_limits_collection, contact_dedup_collection, DEFAULT_TENANT
+
+logger = logging.getLogger(__name__)
+
+# Behind proxies (Vercel, a load balancer) the socket peer is the nearest proxy. Each
+# trusted proxy appends the address it saw to X-Forwarded-For; entries left of those
+# come from the client and can be forged. RATE_LIMIT_TRUST_FORWARDED_FOR=true means one.
+TRUSTED_PROXIES = int(os.environ.get(
+    "RATE_LIMIT_TRUSTED_PROXIES",
+    "1" if os.environ.get("RATE_LIMIT_TRUST_FORWARDED_FOR", "false").lower() == "true" else "0",
+))
+
+
+class RateLimited(Exception):
+    """The caller exhausted a token bucket; retry after ``retry_after`` seconds"""
+
+    def __init__(self, key: str, retry_after: float):
+        super().__init__(f"Rate limit exceeded for {key}")
+        self.key = key
+        self.retry_after = retry_after
+
+
+class MemoryBackend:
+    """Per-process token buckets and dedup fingerprints, bounded by LRU eviction"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+
+    async def take(self, key: str, capacity: float, rate: float) -> float:
+        """Take one token; return 0 if allowed, else seconds until one is available"""
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.pop(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    async def first_seen(self, fingerprint: str, window: float) -> bool:
+        """Record ``fingerprint``; False if it was already seen within ``window`` seconds"""
+        now = time.monotonic()
+        expires_at = self._seen.pop(fingerprint, None)
+        self._seen[fingerprint] = now + window if expires_at is None or expires_at <= now else expires_at
+        if len(self._seen) > self.max_keys:
+            self._seen.popitem(last=False)
+        return expires_at is None or expires_at <= now
+
+    async def forget(self, fingerprint: str):
+        """Drop a recorded fingerprint so the same submission is accepted again"""
+        self._seen.pop(fingerprint, None)
+
+
+class MongoBackend:
+    """Token buckets and dedup fingerprints shared by every worker through Mongo"""
+
+    async def take(self, key: str, capacity: float, rate: float) -> float:
+        now = datetime.utcnow()
+        elapsed = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}
+        refilled = {"$min": [capacity, {"$add": [{"$ifNull": ["$tokens", capacity]}, {"$multiply": [elapsed, rate]}]}]}
+        bucket = await rate_limits_collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "updated_at": now}},
+                {"$set": {
+                    "allowed": {"$gte": ["$tokens", 1]},
+                    "tokens": {"$cond": [{"$gte": ["$tokens", 1]}, {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                }},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return 0.0 if bucket["allowed"] else (1 - bucket["tokens"]) / rate
+
+    async def first_seen(self, fingerprint: str, window: float) -> bool:
+        now = datetime.utcnow()
+        try:
+            # Matches only an expired record; a live one makes the upsert collide on _id
+            await contact_dedup_collection.update_one(
+                {"_id": fingerprint, "expires_at": {"$lte": now}},
+                {"$set": {"expires_at": now + timedelta(seconds=window)}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def forget(self, fingerprint: str):
+        await contact_dedup_collection.delete_one({"_id": fingerprint})
+
+
+class RedisBackend:
+    """Token buckets and dedup fingerprints shared through Redis"""
+
+    TAKE_SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated_at = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + (now - updated_at) * rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, url: str, client=None):
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.from_url(url)
+        self.redis = client
+        self._take = self.redis.register_script(self.TAKE_SCRIPT)
+
+    async def take(self, key: str, capacity: float, rate: float) -> float:
+        return float(await self._take(keys=[f"ratelimit:{key}"], args=[capacity, rate, time.time()]))
+
+    async def first_seen(self, fingerprint: str, window: float) -> bool:
+        return bool(await self.redis.set(f"dedup:{fingerprint}", 1, nx=True, ex=max(1, int(window))))
+
+    async def forget(self, fingerprint: str):
+        await self.redis.delete(f"dedup:{fingerprint}")
+
+
+def client_ip(request, trusted_proxies: Optional[int] = None) -> Optional[str]:
+    """Client address: the X-Forwarded-For entry added by the outermost trusted proxy"""
+    trusted = TRUSTED_PROXIES if trusted_proxies is None else trusted_proxies
+    if trusted > 0:
+        hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        if hops:
+            # Rightmost first: skip the hops our own proxies added, never trust what lies beyond
+            return hops[max(0, len(hops) - trusted)]
+    return request.client.host if request.client else None
+
+
+def contact_fingerprint(email: str, message: str, service_type: str, tenant_id: str = DEFAULT_TENANT) -> str:
+    """Hash of a submission that ignores case and whitespace differences"""
+    normalized = re.sub(r"\s+", " ", message).strip().lower()
+    raw = "\x1f".join([tenant_id, email.strip().lower(), service_type.strip().lower(), normalized])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ContactGuard:
+    """Rate limiting by client IP and email plus duplicate suppression for /api/contact"""
+
+    def __init__(self, backend, ip_burst: float, ip_per_hour: float,
+                 email_burst: float, email_per_hour: float, dedup_window: float):
+        self.backend = backend
+        self.ip_limit = (ip_burst, ip_per_hour / 3600.0)
+        self.email_limit = (email_burst, email_per_hour / 3600.0)
+        self.dedup_window = dedup_window
+        self.rejected = 0
+        self.duplicates = 0
+
+    async def check(self, client_ip: Optional[str], email: str, message: str, service_type: str,
+                    tenant_id: str = DEFAULT_TENANT) -> bool:
+        """Raise RateLimited when over a limit; return False for a duplicate submission.
+
+        Backend failures fail open so an outage never blocks real leads.
+        """
+        try:
+            for key, (capacity, rate) in (
+                (f"ip:{client_ip or 'unknown'}", self.ip_limit),
+                (f"email:{tenant_id}:{email.strip().lower()}", self.email_limit),
+            ):
+                wait = await self.backend.take(key, capacity, rate)
+                if wait > 0:
+                    self.rejected += 1
+                    raise RateLimited(key, wait)
+            if self.dedup_window > 0:
+                fingerprint = contact_fingerprint(email, message, service_type, tenant_id)
+                if not await self.backend.first_seen(fingerprint, self.dedup_window):
+                    self.duplicates += 1
+                    return False
+        except RateLimited:
+            raise
+        except Exception as e:
+            logger.error(f"Contact rate limiter unavailable, allowing request: {str(e)}")
+        return True
+
+    async def release(self, email: str, message: str, service_type: str, tenant_id: str = DEFAULT_TENANT):
+        """Forget a submission check() accepted, after it could not be stored, so a retry is not a duplicate"""
+        if self.dedup_window <= 0:
+            return
+        try:
+            await self.backend.forget(contact_fingerprint(email, message, service_type, tenant_id))
+        except Exception as e:
+            logger.error(f"Failed to release contact fingerprint: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        return {"rejected": self.rejected, "duplicates": self.duplicates}
+
+    @staticmethod
+    def retry_after_header(error: RateLimited) -> str:
+        return str(max(1, math.ceil(error.retry_after)))
+
+
+def create_backend():
+    """Backend chosen by RATE_LIMIT_BACKEND (memory, mongo or redis)"""
+    name = os.environ.get("RATE_LIMIT_BACKEND", "memory").lower()
+    if name == "mongo":
+        return MongoBackend()
+    if name == "redis":
+        return RedisBackend(os.environ.get("REDIS_URL", "redis://localhost:6379/0"))
+    return MemoryBackend()
+
+
+contact_guard = ContactGuard(
+    create_backend(),
+    ip_burst=float(os.environ.get("RATE_LIMIT_IP_BURST", "5")),
+    ip_per_hour=float(os.environ.get("RATE_LIMIT_IP_PER_HOUR", "20")),
+    email_burst=float(os.environ.get("RATE_LIMIT_EMAIL_BURST", "3")),
+    email_per_hour=float(os.environ.get("RATE_LIMIT_EMAIL_PER_HOUR", "5")),
+    dedup_window=float(os.environ.get("CONTACT_DEDUP_WINDOW_SECONDS", "600")),
+)
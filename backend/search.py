@@ -0,0 +1,195 @@
+import logging
+import math
+import os
+import re
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import orjson
+
+from database import DEFAULT_TENANT
+from snapshot import snapshots
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Searchable document types: snapshot name, title field and weighted fields
+SEARCH_TYPES = {
+    "project": ("projects", "title", {"title": 3.0, "tags": 2.5, "description": 1.0, "metrics": 1.0}),
+    "experience": ("experience", "title", {"title": 3.0, "company": 2.0, "achievements": 1.0, "location": 0.5}),
+    "skill": ("skills", "category", {"category": 3.0, "items": 2.0}),
+}
+
+# A term matched only as a prefix of an indexed token scores this fraction
+PREFIX_WEIGHT = 0.5
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def _field_text(value: Any) -> str:
+    return " ".join(value) if isinstance(value, list) else str(value or "")
+
+
+def document_tags(doc_type: str, document: Dict[str, Any]) -> List[str]:
+    """Facet values of a document: project tags and skill items"""
+    if doc_type == "project":
+        return list(document.get("tags", []))
+    if doc_type == "skill":
+        return list(document.get("items", []))
+    return []
+
+
+class SearchIndex:
+    """Inverted index over one tenant's projects, experience and skills.
+
+    Each document type is indexed from its content snapshot and re-indexed on
+    its own when that snapshot's ETag changes, so an edit to one collection
+    leaves the other postings alone.
+    """
+
+    def __init__(self):
+        self.documents: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        self.tags: Dict[Tuple[str, int], Set[str]] = {}
+        self.postings: Dict[str, Dict[Tuple[str, int], float]] = {}
+        self.etags: Dict[str, str] = {}
+        self._vocabulary: Optional[List[str]] = None
+
+    def index_type(self, doc_type: str, documents: List[Dict[str, Any]], etag: str):
+        """Replace every document of ``doc_type`` with ``documents``"""
+        for key in [key for key in self.documents if key[0] == doc_type]:
+            del self.documents[key]
+            del self.tags[key]
+        for token in list(self.postings):
+            postings = self.postings[token]
+            for key in [key for key in postings if key[0] == doc_type]:
+                del postings[key]
+            if not postings:
+                del self.postings[token]
+
+        _, _, weights = SEARCH_TYPES[doc_type]
+        for position, document in enumerate(documents):
+            key = (doc_type, position)
+            self.documents[key] = document
+            self.tags[key] = {tag.lower() for tag in document_tags(doc_type, document)}
+            for field, weight in weights.items():
+                for token in tokenize(_field_text(document.get(field))):
+                    postings = self.postings.setdefault(token, {})
+                    postings[key] = postings.get(key, 0.0) + weight
+        self.etags[doc_type] = etag
+        self._vocabulary = None
+
+    def _expand(self, term: str) -> Dict[Tuple[str, int], float]:
+        """Weighted postings of every token equal to or starting with ``term``"""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        vocabulary = self._vocabulary
+        matches: Dict[Tuple[str, int], float] = {}
+        for i in range(bisect_left(vocabulary, term), len(vocabulary)):
+            token = vocabulary[i]
+            if not token.startswith(term):
+                break
+            postings = self.postings[token]
+            idf = math.log(1 + len(self.documents) / len(postings))
+            factor = idf if token == term else idf * PREFIX_WEIGHT
+            for key, weight in postings.items():
+                matches[key] = max(matches.get(key, 0.0), weight * factor)
+        return matches
+
+    def search(self, query: str, doc_type: Optional[str] = None, tag: Optional[str] = None,
+               limit: int = 20) -> Dict[str, Any]:
+        """Documents matching every query term (as a word or word prefix), best first"""
+        terms = tokenize(query)
+        if terms:
+            scores: Optional[Dict[Tuple[str, int], float]] = None
+            for term in terms:
+                matches = self._expand(term)
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = {key: score + matches[key] for key, score in scores.items() if key in matches}
+                if not scores:
+                    break
+        else:
+            scores = {key: 0.0 for key in self.documents}
+
+        if doc_type:
+            scores = {key: score for key, score in scores.items() if key[0] == doc_type}
+        facets = {"types": dict(Counter(key[0] for key in scores)), "tags": self._tag_counts(scores)}
+        if tag:
+            tag = tag.lower()
+            scores = {key: score for key, score in scores.items() if tag in self.tags[key]}
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return {
+            "query": query,
+            "total": len(ranked),
+            "hits": [self._hit(key, score) for key, score in ranked[:limit]],
+            "facets": facets,
+        }
+
+    def _tag_counts(self, keys: Iterable[Tuple[str, int]]) -> Dict[str, int]:
+        counts: Counter = Counter()
+        for key in keys:
+            counts.update(document_tags(key[0], self.documents[key]))
+        return dict(counts.most_common())
+
+    def _hit(self, key: Tuple[str, int], score: float) -> Dict[str, Any]:
+        doc_type, _ = key
+        document = self.documents[key]
+        return {
+            "type": doc_type,
+            "title": document.get(SEARCH_TYPES[doc_type][1], ""),
+            "score": round(score, 4),
+            "document": document,
+        }
+
+
+class SearchService:
+    """Per-tenant search indexes kept in step with the content snapshots.
+
+    At most ``max_tenants`` indexes are kept; the least recently searched is
+    dropped and rebuilt from its snapshots on its next search.
+    """
+
+    def __init__(self, max_tenants: int = 256):
+        self.max_tenants = max_tenants
+        self.reindexes = 0
+        self._indexes: "OrderedDict[str, SearchIndex]" = OrderedDict()
+
+    async def index(self, tenant_id: str = DEFAULT_TENANT) -> SearchIndex:
+        """The tenant's index, re-indexing any document type whose snapshot changed"""
+        index = self._indexes.get(tenant_id)
+        if index is None:
+            index = self._indexes[tenant_id] = SearchIndex()
+            while len(self._indexes) > self.max_tenants:
+                self._indexes.popitem(last=False)
+        else:
+            self._indexes.move_to_end(tenant_id)
+        for doc_type, (snapshot_name, _, _) in SEARCH_TYPES.items():
+            payload = await snapshots.get(snapshot_name, tenant_id)
+            if index.etags.get(doc_type) != payload.etag:
+                index.index_type(doc_type, orjson.loads(payload.body), payload.etag)
+                self.reindexes += 1
+                logger.info(f"Indexed {snapshot_name} for {tenant_id} search")
+        return index
+
+    async def search(self, query: str, tenant_id: str = DEFAULT_TENANT, doc_type: Optional[str] = None,
+                     tag: Optional[str] = None, limit: int = 20) -> Dict[str, Any]:
+        """Search one tenant's content"""
+        index = await self.index(tenant_id)
+        return index.search(query, doc_type, tag, limit)
+
+    def stats(self) -> Dict[str, int]:
+        """Counters suitable for scraping"""
+        return {
+            "indexes": len(self._indexes),
+            "reindexes": self.reindexes,
+            "tokens": sum(len(index.postings) for index in self._indexes.values()),
+        }
+
+
+search_service = SearchService(max_tenants=int(os.environ.get("SEARCH_MAX_TENANTS", "256")))
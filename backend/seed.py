@@ -0,0 +1,24 @@
+"""Seed default content and apply indexes outside the serving path.
+
+Run once per deploy (e.g. as a release step) with ``python seed.py``.
+"""
+import asyncio
+import logging
+
+from database import DatabaseManager, close_client
+from indexes import ensure_indexes
+from locks import mongo_lock
+
+
+async def main():
+    # The same lock server workers take, so a deploy racing their startup seeds once
+    async with mongo_lock("startup"):
+        await DatabaseManager.backfill_tenant()
+        await DatabaseManager.init_default_data()
+        await ensure_indexes()
+    close_client()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
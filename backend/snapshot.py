@@ -0,0 +1,206 @@
+import asyncio
+import gzip
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+import orjson
+
+from cache import content_cache
+from database import DatabaseManager, CONTENT_COLLECTIONS, DEFAULT_TENANT
+from instrumentation import span, serialize_duration
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Bodies smaller than this gain too little from a Content-Encoding
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "512"))
+
+
+def compress(body: bytes) -> Dict[str, bytes]:
+    """Precompressed variants of ``body`` keyed by content-coding, best first"""
+    variants = {}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=11)
+    # mtime=0 keeps the output identical for identical content
+    variants["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+    return variants
+
+
+class EncodedPayload:
+    """A response body encoded and compressed once, with its strong ETag"""
+
+    __slots__ = ("body", "etag", "encoded")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        # Compressed once per content version, never per request
+        self.encoded = compress(body) if len(body) >= COMPRESS_MIN_BYTES else {}
+
+    @classmethod
+    def from_data(cls, data: Any) -> "EncodedPayload":
+        """Encode ``data`` to compact JSON bytes; datetimes are encoded natively"""
+        return cls(orjson.dumps(data, default=str))
+
+
+class _Snapshot:
+    __slots__ = ("builder", "collections", "payload", "stale", "generation", "built_at", "lock")
+
+    def __init__(self, builder: Callable[[], Awaitable[Any]], collections: Iterable[str]):
+        self.builder = builder
+        self.collections = set(collections)
+        self.payload: Optional[EncodedPayload] = None
+        self.stale = True
+        self.generation = 0
+        self.built_at = 0.0
+        self.lock = asyncio.Lock()
+
+
+class SnapshotStore:
+    """Pre-serialized response bodies, per tenant, rebuilt only when content changes.
+
+    ``max_age`` bounds how long a snapshot is trusted when content is edited
+    outside the app and no change stream is available to report it. At most
+    ``max_entries`` (snapshot, tenant) bodies are kept; the least recently
+    served is evicted and rebuilt on its next request.
+    """
+
+    def __init__(self, max_age: float = 300.0, max_entries: int = 1024):
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._builders: Dict[str, Tuple[Callable[[str], Awaitable[Any]], Iterable[str]]] = {}
+        self._snapshots: "OrderedDict[Tuple[str, str], _Snapshot]" = OrderedDict()
+
+    def register(self, name: str, builder: Callable[[str], Awaitable[Any]], collections: Iterable[str]):
+        """Register a snapshot built by ``builder(tenant_id)`` from ``collections``"""
+        self._builders[name] = (builder, list(collections))
+
+    def _snapshot(self, name: str, tenant_id: str) -> _Snapshot:
+        key = (name, tenant_id)
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None:
+            self._snapshots.move_to_end(key)
+            return snapshot
+        builder, collections = self._builders[name]
+        snapshot = self._snapshots[key] = _Snapshot(lambda: builder(tenant_id), collections)
+        while len(self._snapshots) > self.max_entries:
+            self._snapshots.popitem(last=False)
+            self.evictions += 1
+        return snapshot
+
+    async def get(self, name: str, tenant_id: str = DEFAULT_TENANT) -> EncodedPayload:
+        """Return the current snapshot for ``tenant_id``, building it if content changed"""
+        snapshot = self._snapshot(name, tenant_id)
+        if self._fresh(snapshot):
+            return snapshot.payload
+        async with snapshot.lock:
+            if self._fresh(snapshot):
+                return snapshot.payload
+            generation = snapshot.generation
+            data = await snapshot.builder()
+            with span("serialize", serialize_duration, name):
+                payload = EncodedPayload.from_data(data)
+            snapshot.payload = payload
+            snapshot.built_at = time.monotonic()
+            # Stay stale if content changed again while we were building
+            snapshot.stale = snapshot.generation != generation
+            logger.info(f"Built {name} snapshot for {tenant_id} ({len(payload.body)} bytes)")
+            return payload
+
+    def names(self):
+        """Names of every registered snapshot"""
+        return list(self._builders)
+
+    def is_built(self, name: str, tenant_id: str = DEFAULT_TENANT) -> bool:
+        """Whether ``name`` has a current payload ready to serve for ``tenant_id``"""
+        snapshot = self._snapshots.get((name, tenant_id))
+        return snapshot is not None and self._fresh(snapshot)
+
+    def stats(self) -> Dict[str, int]:
+        """Counters suitable for scraping"""
+        return {"entries": len(self._snapshots), "max_entries": self.max_entries, "evictions": self.evictions}
+
+    def _fresh(self, snapshot: _Snapshot) -> bool:
+        return not snapshot.stale and time.monotonic() - snapshot.built_at < self.max_age
+
+    def invalidate(self, collection: Optional[str] = None, tenant_id: Optional[str] = None):
+        """Mark ``tenant_id``'s snapshots built from ``collection`` as stale; None means all"""
+        for (_, snapshot_tenant), snapshot in self._snapshots.items():
+            if tenant_id is not None and snapshot_tenant != tenant_id:
+                continue
+            if collection is None or collection in snapshot.collections:
+                snapshot.generation += 1
+                snapshot.stale = True
+
+
+def profile_document(profile: Dict[str, Any], about: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape the profile and about documents the way the frontend expects"""
+    return {
+        "name": profile["name"],
+        "tagline": profile["tagline"],
+        "subtitle": profile["subtitle"],
+        "email": profile["email"],
+        "phone": profile["phone"],
+        "location": profile["location"],
+        "website": profile["website"],
+        "profileImage": profile["profile_image"],
+        "about": {
+            "title": about["title"],
+            "description": about["description"],
+            "story": about["story"]
+        }
+    }
+
+
+async def build_portfolio(tenant_id: str = DEFAULT_TENANT) -> Dict[str, Any]:
+    """Assemble the whole portfolio document from the content getters"""
+    profile, about, skills, experience, projects, testimonials = await asyncio.gather(
+        DatabaseManager.get_profile(tenant_id),
+        DatabaseManager.get_about(tenant_id),
+        DatabaseManager.get_skills(tenant_id),
+        DatabaseManager.get_experience(tenant_id),
+        DatabaseManager.get_projects(tenant_id),
+        DatabaseManager.get_testimonials(tenant_id),
+    )
+    if not profile or not about:
+        raise LookupError("Profile information not found")
+    return {
+        "profile": profile_document(profile, about),
+        "skills": skills,
+        "experience": experience,
+        "projects": projects,
+        "testimonials": testimonials,
+    }
+
+
+async def build_profile(tenant_id: str = DEFAULT_TENANT) -> Dict[str, Any]:
+    """Assemble the profile document served by /api/profile"""
+    profile, about = await asyncio.gather(
+        DatabaseManager.get_profile(tenant_id),
+        DatabaseManager.get_about(tenant_id)
+    )
+    if not profile or not about:
+        raise LookupError("Profile information not found")
+    return profile_document(profile, about)
+
+
+snapshots = SnapshotStore(
+    max_age=content_cache.ttl,
+    max_entries=int(os.environ.get("SNAPSHOT_MAX_ENTRIES", "1024")),
+)
+snapshots.register("portfolio", build_portfolio, CONTENT_COLLECTIONS)
+snapshots.register("profile", build_profile, ["profile", "about"])
+snapshots.register("skills", DatabaseManager.get_skills, ["skills"])
+snapshots.register("experience", DatabaseManager.get_experience, ["experience"])
+snapshots.register("projects", DatabaseManager.get_projects, ["projects"])
+snapshots.register("testimonials", DatabaseManager.get_testimonials, ["testimonials"])
+content_cache.add_listener(snapshots.invalidate)
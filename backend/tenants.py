@@ -0,0 +1,81 @@
+import logging
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException, Request
+
+import config  # noqa: F401
+from cache import content_cache
+from database import DEFAULT_TENANT, tenants_collection
+from ghl_integration import GHLAccount, ghl_integration
+
+logger = logging.getLogger(__name__)
+
+# Explicit tenant selection, for previews and deployments without per-tenant hosts
+TENANT_HEADER = "x-tenant"
+
+# Tenant documents look like:
+#   {"_id": "jenn", "hosts": ["jenn.example.com"],
+#    "ghl": {"api_key": "...", "location_id": "...", "pipeline_id": "...", "stage_id": "..."}}
+# Every tenant is loaded into one content cache entry under the "tenants" tag,
+# so edits are picked up by the change stream watcher or after the cache TTL,
+# and lookups of unknown ids or hosts never add entries of their own.
+
+
+async def tenant_directory() -> Dict[str, Dict[str, Any]]:
+    """Every tenant document by id, and every tenant id by host"""
+    async def load():
+        by_id: Dict[str, Any] = {}
+        by_host: Dict[str, str] = {}
+        async for tenant in tenants_collection.find({}):
+            by_id[tenant["_id"]] = tenant
+            for host in tenant.get("hosts", []):
+                by_host[host.lower()] = tenant["_id"]
+        return {"by_id": by_id, "by_host": by_host}
+    return await content_cache.get_or_load(("tenants",), load, ["tenants"])
+
+
+async def get_tenant(tenant_id: str) -> Optional[Dict[str, Any]]:
+    """The tenant document for ``tenant_id``, or None if it is not registered"""
+    return (await tenant_directory())["by_id"].get(tenant_id)
+
+
+async def tenant_for_host(host: str) -> Optional[str]:
+    """The tenant serving ``host``, or None for unknown hosts"""
+    return (await tenant_directory())["by_host"].get(host)
+
+
+async def resolve_tenant(request: Request) -> str:
+    """FastAPI dependency: tenant from the X-Tenant header, else the Host, else the default"""
+    slug = request.headers.get(TENANT_HEADER)
+    if slug:
+        if slug != DEFAULT_TENANT and await get_tenant(slug) is None:
+            raise HTTPException(status_code=404, detail=f"Unknown tenant: {slug}")
+        return slug
+    host = request.headers.get("host", "").split(":")[0].lower()
+    if host:
+        try:
+            tenant_id = await tenant_for_host(host)
+        except Exception as e:
+            logger.error(f"Tenant lookup failed for {host}, serving the default tenant: {str(e)}")
+            tenant_id = None
+        if tenant_id:
+            return tenant_id
+    return DEFAULT_TENANT
+
+
+async def ghl_account(tenant_id: Optional[str]) -> GHLAccount:
+    """GoHighLevel credentials for ``tenant_id``; the environment's for the default tenant"""
+    tenant_id = tenant_id or DEFAULT_TENANT
+    tenant = await get_tenant(tenant_id)
+    settings = (tenant or {}).get("ghl")
+    if settings:
+        return GHLAccount(
+            settings.get("api_key"),
+            settings.get("location_id"),
+            settings.get("pipeline_id"),
+            settings.get("stage_id"),
+        )
+    if tenant_id == DEFAULT_TENANT:
+        return ghl_integration.default_account
+    # Never sync another tenant's leads into the default account
+    return GHLAccount(None, None)
@@ -0,0 +1,46 @@
+"""Shared test setup: the app's flat imports and a fresh in-memory Mongo per test.
+
+Run from the backend directory with ``python -m pytest -q tests``.
+"""
+import os
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+# The app uses flat imports across the backend directories
+sys.path[:0] = [str(BACKEND_DIR), str(BACKEND_DIR / "backend"), str(BACKEND_DIR / "backend" / "backend")]
+os.environ.setdefault("ADMIN_API_TOKEN", "test-token")
+
+import pytest  # noqa: E402
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+
+import database  # noqa: E402
+from cache import content_cache  # noqa: E402
+
+ADMIN_HEADERS = {"X-Admin-Token": os.environ["ADMIN_API_TOKEN"]}
+
+
+@pytest.fixture(autouse=True)
+def mongo(monkeypatch):
+    """Point every collection at an empty in-memory database"""
+    client = AsyncMongoMockClient()
+    monkeypatch.setattr(database, "_client", client)
+    content_cache.clear()
+    yield client
+    content_cache.clear()
+
+
+@pytest.fixture
+def api():
+    """Send requests to the app in-process, without running its startup hooks"""
+    import asyncio
+    import httpx
+    import server
+
+    def send(method: str, path: str, **kwargs) -> httpx.Response:
+        async def request():
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.request(method, path, **kwargs)
+        return asyncio.run(request())
+    return send
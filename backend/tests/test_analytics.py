@@ -0,0 +1,57 @@
+import asyncio
+
+import analytics
+from conftest import ADMIN_HEADERS
+from database import DatabaseManager, contact_rollups_collection
+from models import ContactMessageCreate
+from outbox import ghl_outbox
+
+
+def message(service_type="General Inquiry"):
+    return ContactMessageCreate(name="Ada", email="ada@example.com", subject="Hi", message="Hello there",
+                                service_type=service_type)
+
+
+class Unqueried:
+    def __getattr__(self, name):
+        raise AssertionError("contact_messages was queried")
+
+
+def test_status_counts_come_from_the_rollups(monkeypatch):
+    async def run():
+        first = await DatabaseManager.create_contact_message(message())
+        await DatabaseManager.create_contact_message(message())
+        await DatabaseManager.create_contact_message(message("Consulting"))
+        await ghl_outbox._record_status({"message_id": first}, "retrying", "timeout")
+        await ghl_outbox._record_status({"message_id": first}, "synced")
+        # Recording the same outcome twice moves nothing
+        await ghl_outbox._record_status({"message_id": first}, "synced")
+
+        monkeypatch.setattr(analytics, "contact_messages_collection", Unqueried())
+        report = await analytics.contact_analytics()
+        assert report["total"]["count"] == 3
+        assert report["by_status"] == {"new": 3}
+        assert report["by_sync_status"] == {"pending": 2, "synced": 1}
+        assert await contact_rollups_collection.count_documents({}) == 2
+    asyncio.run(run())
+
+
+def test_mixed_aware_and_naive_bounds_are_accepted(api):
+    response = api("GET", "/api/admin/analytics/contacts", headers=ADMIN_HEADERS,
+                   params={"start": "2026-01-01T00:00:00+02:00", "end": "2026-02-01T00:00:00"})
+    assert response.status_code == 200, response.text
+    assert response.json()["start"].startswith("2025-12-31")
+
+    response = api("GET", "/api/admin/analytics/contacts", headers=ADMIN_HEADERS,
+                   params={"start": "2026-02-01T00:00:00Z", "end": "2026-01-01T00:00:00"})
+    assert response.status_code == 400
+
+
+def test_a_range_within_one_day_covers_that_day():
+    async def run():
+        await DatabaseManager.create_contact_message(message())
+        today = analytics.datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        report = await analytics.contact_analytics(start=today, end=today + analytics.timedelta(hours=23))
+        assert report["end"] - report["start"] == analytics.timedelta(days=1)
+        assert report["total"]["count"] == 1
+    asyncio.run(run())
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+import bulk_ingest
+from bulk_ingest import BulkFormatError, iter_json_array, iter_ndjson
+
+
+def parse(body: bytes, chunk_size: int, parser=iter_json_array):
+    async def chunks():
+        for i in range(0, len(body), chunk_size):
+            yield body[i:i + chunk_size]
+
+    async def run():
+        return [item async for item in parser(chunks())]
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 1 << 16])
+def test_valid_array_parses_the_same_at_any_chunk_size(chunk_size):
+    body = b'[{"a": true, "b": "x\\u00e9,]"}, {"c": [1, 2.5e3, null]}, {"d": false} ]'
+    assert parse(body, chunk_size) == [
+        ({"a": True, "b": "xé,]"}, ""), ({"c": [1, 2500.0, None]}, ""), ({"d": False}, ""),
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 1 << 16])
+def test_malformed_element_is_reported_and_later_elements_are_kept(chunk_size):
+    body = b'[{"a": 1}, {"b": 2,, "s": "},"}, {"c": 3}]'
+    results = parse(body, chunk_size)
+    assert [record for record, _ in results] == [{"a": 1}, None, {"c": 3}]
+    assert results[1][1].startswith("Invalid JSON") and "skipped" in results[1][1]
+
+
+def test_unrecoverable_element_stops_with_its_index():
+    with pytest.raises(BulkFormatError, match="element 1 .*not read"):
+        parse(b'[{"a": 1}, {"b": tru', 4)
+
+
+@pytest.mark.parametrize("parser", [iter_json_array, iter_ndjson])
+def test_record_limit_counts_encoded_bytes(monkeypatch, parser):
+    monkeypatch.setattr(bulk_ingest, "MAX_RECORD_BYTES", 64)
+    # 40 characters but 80 bytes of UTF-8, never completed
+    body = ('[{"n": "' if parser is iter_json_array else '{"n": "').encode() + "é".encode() * 40
+    with pytest.raises(BulkFormatError, match="exceeds 64 bytes"):
+        parse(body, 16, parser)
@@ -0,0 +1,166 @@
+import asyncio
+
+from pymongo.errors import AutoReconnect, ConnectionFailure, OperationFailure, ServerSelectionTimeoutError
+
+import cache as cache_module
+from cache import ContentCache, InvalidationBroadcast, content_cache, watch_collection_changes
+from database import DatabaseManager
+from models import Project
+from snapshot import snapshots
+
+
+def test_invalidation_is_scoped_to_the_tenant():
+    cache = ContentCache()
+    loads = []
+
+    @cache.cached("projects")
+    async def get_projects(tenant_id: str = "default"):
+        loads.append(tenant_id)
+        return tenant_id
+
+    async def run():
+        await get_projects("a")
+        await get_projects(tenant_id="b")
+        cache.invalidate_collection("projects", "a")
+        await get_projects("a")
+        await get_projects(tenant_id="b")
+        assert loads == ["a", "b", "a"]
+        cache.invalidate_collection("projects")
+        await get_projects("a")
+        await get_projects(tenant_id="b")
+        assert loads == ["a", "b", "a", "a", "b"]
+    asyncio.run(run())
+
+
+def test_entries_without_a_tenant_are_dropped_by_any_tenant_write():
+    cache = ContentCache()
+
+    async def run():
+        await cache.get_or_load("directory", lambda: asyncio.sleep(0, "v1"), ["tenants"])
+        cache.invalidate_collection("tenants", "a")
+        assert await cache.get_or_load("directory", lambda: asyncio.sleep(0, "v2"), ["tenants"]) == "v2"
+    asyncio.run(run())
+
+
+def test_content_write_leaves_other_tenants_snapshots_alone():
+    async def run():
+        await snapshots.get("projects", "a")
+        await snapshots.get("projects", "b")
+        await DatabaseManager.create_content("projects", [Project(
+            title="New", description="d", image="i.png", metrics=["m"], tags=["x"])], "a")
+        assert not snapshots.is_built("projects", "a")
+        assert snapshots.is_built("projects", "b")
+    asyncio.run(run())
+
+
+def test_broadcast_carries_the_tenant():
+    cache = ContentCache()
+    broadcast = InvalidationBroadcast(cache)
+    seen = []
+    cache.add_listener(lambda collection, tenant_id: seen.append((collection, tenant_id)))
+    broadcast.origin = "here"
+    broadcast._apply({"collection": "projects", "tenant_id": "a", "origin": "elsewhere"})
+    broadcast._apply({"collection": None, "tenant_id": None, "origin": "elsewhere"})
+    assert seen == [("projects", "a"), (None, None)]
+    assert content_cache is not cache
+
+
+class FakeStream:
+    def __init__(self, changes):
+        self.changes = changes
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.changes:
+            raise ConnectionFailure("stream dropped")
+        return self.changes.pop(0)
+
+
+class FakeDatabase:
+    """Answers each watch() with the next scripted outcome: an exception or a list of changes"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def watch(self, pipeline, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeStream(outcome)
+
+
+def test_change_stream_retries_connection_errors_and_stops_only_when_unsupported(monkeypatch):
+    monkeypatch.setattr(cache_module, "RETRY_MIN_SECONDS", 0.001)
+    cache = ContentCache()
+    seen = []
+    cache.add_listener(lambda collection, tenant_id: seen.append((collection, tenant_id)))
+    db = FakeDatabase(
+        ServerSelectionTimeoutError("no primary yet"),
+        [{"ns": {"coll": "projects"}, "fullDocument": {"tenant_id": "a"}}],
+        OperationFailure("The $changeStream stage is only supported on replica sets", code=40573),
+    )
+    asyncio.run(watch_collection_changes(db, cache, ["projects"]))
+    assert db.calls == 3
+    assert ("projects", "a") in seen
+
+
+class FakeEvents:
+    def __init__(self, failures):
+        self.failures = failures
+        self.finds = 0
+
+    async def find_one(self, *args, **kwargs):
+        return None
+
+    def find(self, *args, **kwargs):
+        self.finds += 1
+        raise self.failures.pop(0)
+
+
+def test_broadcast_retries_connection_errors_and_stops_only_when_unsupported(monkeypatch):
+    monkeypatch.setattr(cache_module, "RETRY_MIN_SECONDS", 0.001)
+    events = FakeEvents([AutoReconnect("primary stepped down"),
+                         OperationFailure("tailable cursor requested on non capped collection", code=2)])
+    creates = []
+
+    class Database:
+        def __getitem__(self, name):
+            return events
+
+        async def create_collection(self, name, **kwargs):
+            creates.append(name)
+            if len(creates) == 1:
+                raise ServerSelectionTimeoutError("no primary yet")
+
+    broadcast = InvalidationBroadcast(ContentCache())
+    asyncio.run(broadcast.run(Database()))
+    assert creates == ["cache_events", "cache_events"]
+    assert events.finds == 2
+    assert not broadcast.active
+
+
+def test_positional_keyword_and_default_calls_share_an_entry():
+    cache = ContentCache()
+    loads = []
+
+    @cache.cached("projects")
+    async def get_projects(tenant_id: str = "default"):
+        loads.append(tenant_id)
+        return tenant_id
+
+    async def run():
+        await get_projects("default")
+        await get_projects(tenant_id="default")
+        await get_projects()
+        assert loads == ["default"]
+    asyncio.run(run())
@@ -0,0 +1,65 @@
+import asyncio
+
+import httpx
+import pytest
+
+from circuit_breaker import CircuitOpenError
+from database import ghl_outbox_collection
+from ghl_integration import GHLAccount, ghl_integration
+import outbox
+from outbox import GHLOutbox
+
+LIMITED = GHLAccount("key-a", "loc-a")
+HEALTHY = GHLAccount("key-b", "loc-b")
+
+
+@pytest.fixture
+def ghl(monkeypatch):
+    """GHL answers 429 for loc-a and 200 for everyone else"""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.headers["authorization"])
+        if request.headers["authorization"] == "Bearer key-a":
+            return httpx.Response(429)
+        return httpx.Response(200, json={"contact": {"id": "c1"}})
+
+    monkeypatch.setattr(ghl_integration, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(ghl_integration, "_breakers", type(ghl_integration._breakers)())
+    return calls
+
+
+def test_rate_limited_account_does_not_trip_the_others(ghl):
+    async def run():
+        for _ in range(ghl_integration.breaker_settings["min_calls"]):
+            await ghl_integration.request("GET", "/contacts/", "test", LIMITED)
+        with pytest.raises(CircuitOpenError):
+            await ghl_integration.request("GET", "/contacts/", "test", LIMITED)
+        response = await ghl_integration.request("GET", "/contacts/", "test", HEALTHY)
+        assert response.status_code == 200
+    asyncio.run(run())
+    stats = ghl_integration.breaker_stats()
+    assert stats["open"] == 1
+    assert stats["locations"]["loc-a"]["state"] == "open"
+    assert stats["locations"]["loc-b"]["state"] == "closed"
+
+
+def test_outbox_defers_jobs_for_an_open_account_without_calling_it(ghl, monkeypatch):
+    sync_outbox = GHLOutbox()
+
+    async def account_for(tenant_id):
+        return LIMITED
+    monkeypatch.setattr(outbox, "ghl_account", account_for)
+
+    async def run():
+        for _ in range(ghl_integration.breaker_settings["min_calls"]):
+            await ghl_integration.request("GET", "/contacts/", "test", LIMITED)
+        calls_before = len(ghl)
+        await sync_outbox.enqueue("64b000000000000000000001", {"name": "Ada"}, "a")
+        job = await sync_outbox._claim()
+        await sync_outbox._run(job)
+        job = await ghl_outbox_collection.find_one({"_id": job["_id"]})
+        assert job["status"] == "pending" and job["attempts"] == 0
+        assert "loc-a" in job["last_error"]
+        assert len(ghl) == calls_before
+    asyncio.run(run())
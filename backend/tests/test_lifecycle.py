@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+import locks
+import server
+from database import locks_collection
+
+
+class SlowRelease:
+    """locks_collection whose delete_one takes a few event loop turns, like a real round trip"""
+
+    def __getattr__(self, name):
+        return getattr(locks_collection, name)
+
+    async def delete_one(self, *args, **kwargs):
+        await asyncio.sleep(0.05)
+        return await locks_collection.delete_one(*args, **kwargs)
+
+
+def test_shutdown_waits_for_prepare_to_release_its_lock(monkeypatch):
+    async def run():
+        preparing = asyncio.Event()
+
+        async def prepare_database():
+            preparing.set()
+            await asyncio.sleep(3600)
+
+        async def no_changes():
+            await asyncio.sleep(3600)
+
+        finished_at_close = []
+        monkeypatch.setattr(locks, "locks_collection", SlowRelease())
+        monkeypatch.setattr(server, "prepare_database", prepare_database)
+        monkeypatch.setattr(server, "follow_content_changes", no_changes)
+        monkeypatch.setattr(server, "close_client", lambda: finished_at_close.append(server.app.state.prepare.done()))
+
+        await server.startup_event()
+        await preparing.wait()
+        assert await locks_collection.count_documents({"_id": "startup"}) == 1
+        await server.shutdown_db_client()
+        assert finished_at_close == [True]
+        assert await locks_collection.count_documents({"_id": "startup"}) == 0
+    asyncio.run(run())
+
+
+def test_prepare_retries_until_the_database_is_ready(monkeypatch):
+    async def run():
+        failures = [ConnectionError("mongo down"), ConnectionError("mongo down")]
+
+        async def backfill_tenant():
+            if failures:
+                raise failures.pop()
+
+        monkeypatch.setattr(server.DatabaseManager, "backfill_tenant", backfill_tenant)
+        monkeypatch.setattr(server, "RETRY_MIN_SECONDS", 0.01)
+        monkeypatch.setattr(server, "startup_state", dict.fromkeys(server.startup_state, False))
+
+        task = asyncio.create_task(server.prepare_in_background())
+        while len(failures) == 2:
+            await asyncio.sleep(0)
+        assert (await server.readiness()).status_code == 503
+        await task
+        assert failures == []
+        response = await server.readiness()
+        assert response.status_code == 200
+        assert json.loads(response.body)["indexes"]
+    asyncio.run(run())
@@ -0,0 +1,59 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from conftest import ADMIN_HEADERS
+from database import DatabaseManager, contact_messages_collection, ghl_outbox_collection
+from models import ContactMessageCreate
+from outbox import GHLOutbox
+
+
+def store_message(tenant_id="default", age=timedelta(minutes=5)):
+    async def run():
+        message_id = await DatabaseManager.create_contact_message(ContactMessageCreate(
+            name="Ada", email="ada@example.com", subject="Hi", message="Hello there", service_type="Consulting"
+        ), tenant_id)
+        await contact_messages_collection.update_one(
+            {"tenant_id": tenant_id}, {"$set": {"created_at": datetime.utcnow() - age}}
+        )
+        return message_id
+    return run()
+
+
+def test_sweep_enqueues_pending_messages_without_a_job():
+    outbox = GHLOutbox(sweep_grace=60)
+
+    async def run():
+        orphan = await store_message("jenn")
+        queued = await store_message()
+        await outbox.enqueue(queued, {"name": "Ada"})
+        await store_message("recent", age=timedelta(0))
+
+        assert await outbox.sweep() == 1
+        job = await ghl_outbox_collection.find_one({"_id": f"contact:{orphan}"})
+        assert job["tenant_id"] == "jenn"
+        assert job["payload"]["service_type"] == "Consulting"
+        assert await outbox.sweep() == 0
+        assert await ghl_outbox_collection.count_documents({}) == 2
+    asyncio.run(run())
+
+
+def test_outbox_stats_are_cached():
+    outbox = GHLOutbox(stats_ttl=60)
+
+    async def run():
+        await outbox.enqueue("a", {})
+        assert await outbox.stats() == {"pending": 1}
+        await outbox.enqueue("b", {})
+        assert await outbox.stats() == {"pending": 1}
+        assert await outbox.stats(refresh=True) == {"pending": 2}
+        await outbox.enqueue("c", {})
+        outbox.stats_ttl = 0
+        assert await outbox.stats() == {"pending": 3}
+    asyncio.run(run())
+
+
+def test_operational_stats_are_admin_only(api):
+    for path in ["outbox/stats", "cache/stats", "ghl/pool", "ghl/circuit", "contact/limits", "search/stats"]:
+        assert api("GET", f"/api/{path}").status_code == 404
+        assert api("GET", f"/api/admin/{path}").status_code in (401, 403)
+        assert api("GET", f"/api/admin/{path}", headers=ADMIN_HEADERS).status_code == 200
@@ -0,0 +1,102 @@
+import asyncio
+
+import fakeredis
+import pytest
+from starlette.requests import Request
+
+import database
+import server
+from database import DatabaseManager, contact_messages_collection, contact_dedup_collection
+from rate_limit import ContactGuard, MemoryBackend, MongoBackend, RedisBackend, client_ip
+
+CONTACT = {
+    "name": "Ada Lovelace",
+    "email": "ada@example.com",
+    "subject": "Hello",
+    "message": "I would like to talk about a project.",
+    "service_type": "General Inquiry",
+}
+
+
+def make_request(forwarded_for=None, peer="10.0.0.1"):
+    headers = [(b"x-forwarded-for", forwarded_for.encode())] if forwarded_for else []
+    return Request({"type": "http", "headers": headers, "client": (peer, 1234)})
+
+
+def test_client_ip_ignores_forwarded_for_without_trusted_proxies():
+    assert client_ip(make_request("203.0.113.9"), trusted_proxies=0) == "10.0.0.1"
+
+
+def test_client_ip_takes_the_hop_added_by_the_outermost_trusted_proxy():
+    # The client forged the leftmost entry; our one proxy appended the real address
+    assert client_ip(make_request("1.2.3.4, 203.0.113.9"), trusted_proxies=1) == "203.0.113.9"
+    # Two proxies: the inner one appended the outer proxy's address
+    assert client_ip(make_request("1.2.3.4, 203.0.113.9, 10.0.0.7"), trusted_proxies=2) == "203.0.113.9"
+    # Fewer hops than proxies: nothing beyond the leftmost can be trusted more
+    assert client_ip(make_request("203.0.113.9"), trusted_proxies=2) == "203.0.113.9"
+
+
+def test_rotating_forwarded_for_does_not_reset_the_ip_bucket():
+    guard = ContactGuard(MemoryBackend(), 2, 2, 100, 100, 0)
+
+    async def submit(spoofed):
+        ip = client_ip(make_request(f"{spoofed}, 203.0.113.9"), trusted_proxies=1)
+        return await guard.check(ip, f"{spoofed}@example.com", "hi", "General Inquiry")
+
+    async def run():
+        await submit("1.1.1.1")
+        await submit("2.2.2.2")
+        await submit("3.3.3.3")
+    with pytest.raises(Exception, match="ip:203.0.113.9"):
+        asyncio.run(run())
+
+
+def redis_backend():
+    return RedisBackend("redis://unused", client=fakeredis.FakeAsyncRedis())
+
+
+@pytest.mark.parametrize("make_backend", [MemoryBackend, MongoBackend, redis_backend],
+                         ids=["memory", "mongo", "redis"])
+def test_backend_token_bucket_and_dedup(make_backend):
+    async def run():
+        backend = make_backend()
+        assert await backend.take("ip:a", 2, 0.001) == 0
+        assert await backend.take("ip:a", 2, 0.001) == 0
+        assert await backend.take("ip:a", 2, 0.001) > 0
+        assert await backend.take("ip:b", 2, 0.001) == 0
+
+        assert await backend.first_seen("fp", 60) is True
+        assert await backend.first_seen("fp", 60) is False
+        await backend.forget("fp")
+        assert await backend.first_seen("fp", 60) is True
+    asyncio.run(run())
+
+
+def test_mongo_backend_accepts_a_fingerprint_again_once_expired():
+    async def run():
+        backend = MongoBackend()
+        assert await backend.first_seen("fp", 60) is True
+        await contact_dedup_collection.update_one({"_id": "fp"}, {"$set": {"expires_at": database.datetime(2000, 1, 1)}})
+        assert await backend.first_seen("fp", 60) is True
+    asyncio.run(run())
+
+
+def test_contact_retry_after_failed_insert_is_stored(api, monkeypatch):
+    monkeypatch.setattr(server, "contact_guard", ContactGuard(MemoryBackend(), 100, 100, 100, 100, 600))
+    original = DatabaseManager.create_contact_message
+
+    async def failing(*args, **kwargs):
+        raise RuntimeError("primary stepped down")
+    monkeypatch.setattr(DatabaseManager, "create_contact_message", failing)
+    assert api("POST", "/api/contact", json=CONTACT).status_code == 500
+
+    monkeypatch.setattr(DatabaseManager, "create_contact_message", original)
+    retry = api("POST", "/api/contact", json=CONTACT)
+    assert retry.status_code == 200
+    assert retry.json()["id"]
+    assert asyncio.run(contact_messages_collection.count_documents({})) == 1
+
+    # A genuine resend after the stored one is still suppressed
+    resend = api("POST", "/api/contact", json=CONTACT)
+    assert resend.status_code == 200 and resend.json()["id"] is None
+    assert asyncio.run(contact_messages_collection.count_documents({})) == 1
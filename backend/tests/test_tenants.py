@@ -0,0 +1,27 @@
+import asyncio
+
+from cache import content_cache
+from database import tenants_collection
+from tenants import get_tenant, tenant_for_host
+
+
+def test_unknown_hosts_and_tenants_do_not_add_cache_entries():
+    async def run():
+        await tenants_collection.insert_one({"_id": "jenn", "hosts": ["Jenn.example.com"]})
+        assert await tenant_for_host("jenn.example.com") == "jenn"
+        assert (await get_tenant("jenn"))["hosts"] == ["Jenn.example.com"]
+        entries = content_cache.stats()["entries"]
+        for i in range(50):
+            assert await tenant_for_host(f"random-{i}.example.com") is None
+            assert await get_tenant(f"random-{i}") is None
+        assert content_cache.stats()["entries"] == entries == 1
+    asyncio.run(run())
+
+
+def test_tenant_edits_are_seen_after_invalidation():
+    async def run():
+        assert await tenant_for_host("new.example.com") is None
+        await tenants_collection.insert_one({"_id": "new", "hosts": ["new.example.com"]})
+        content_cache.invalidate_collection("tenants")
+        assert await tenant_for_host("new.example.com") == "new"
+    asyncio.run(run())
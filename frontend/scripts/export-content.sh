@@ -0,0 +1,22 @@
+#!/bin/sh
+# Export the portfolio content into public/content before the frontend build.
+#
+# Needs the backend's Python dependencies and MONGO_URL/DB_NAME in the build
+# environment (set EXPORT_INSTALL_DEPS=true to pip install them first). When
+# either is missing the export is skipped and the site reads the API instead.
+cd "$(dirname "$0")/../../backend" || exit 0
+PYTHON="${PYTHON:-python3}"
+if ! command -v "$PYTHON" >/dev/null 2>&1; then
+  echo "Skipping content export: $PYTHON not found"
+  exit 0
+fi
+if [ "$EXPORT_INSTALL_DEPS" = "true" ]; then
+  "$PYTHON" -m pip install --quiet -r requirements.txt || echo "Installing backend dependencies failed"
+fi
+if ! "$PYTHON" -c "import motor, orjson, pydantic" 2>/dev/null; then
+  echo "Skipping content export: backend dependencies are not installed"
+  exit 0
+fi
+# The backend uses flat imports across its nested directories
+export PYTHONPATH=".:backend:backend/backend${PYTHONPATH:+:$PYTHONPATH}"
+exec "$PYTHON" export.py --if-reachable
@@ -2,10 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Card, CardContent } from './ui/card';
 import { Badge } from './ui/badge';
 import { Target, Shield, Lightbulb, Award } from 'lucide-react';
-import axios from 'axios';
-
-const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
-const API = `${BACKEND_URL}/api`;
+import { getContent } from '../lib/content';
 
 const About = () => {
   const [profileData, setProfileData] = useState(null);
@@ -14,8 +11,8 @@ const About = () => {
   useEffect(() => {
     const fetchProfile = async () => {
       try {
-        const response = await axios.get(`${API}/profile`);
-        setProfileData(response.data);
+        const data = await getContent('profile');
+        setProfileData(data);
       } catch (error) {
         console.error('Error fetching profile:', error);
       } finally {
@@ -8,6 +8,7 @@ import { Badge } from './ui/badge';
 import { Mail, Phone, MapPin, Send, MessageSquare, Calendar } from 'lucide-react';
 import { useToast } from '../hooks/use-toast';
 import axios from 'axios';
+import { getContent } from '../lib/content';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -27,8 +28,8 @@ const Contact = () => {
   useEffect(() => {
     const fetchProfile = async () => {
       try {
-        const response = await axios.get(`${API}/profile`);
-        setProfileData(response.data);
+        const data = await getContent('profile');
+        setProfileData(data);
       } catch (error) {
         console.error('Error fetching profile:', error);
       }
@@ -2,10 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Card, CardContent, CardHeader, CardTitle } from './ui/card';
 import { Badge } from './ui/badge';
 import { MapPin, Calendar, Building } from 'lucide-react';
-import axios from 'axios';
-
-const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
-const API = `${BACKEND_URL}/api`;
+import { getContent } from '../lib/content';
 
 const Experience = () => {
   const [experience, setExperience] = useState([]);
@@ -14,8 +11,8 @@ const Experience = () => {
   useEffect(() => {
     const fetchExperience = async () => {
       try {
-        const response = await axios.get(`${API}/experience`);
-        setExperience(response.data);
+        const data = await getContent('experience');
+        setExperience(data);
       } catch (error) {
         console.error('Error fetching experience:', error);
       } finally {
@@ -1,10 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { Button } from './ui/button';
 import { ArrowDown, Mail, Phone, MapPin } from 'lucide-react';
-import axios from 'axios';
-
-const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
-const API = `${BACKEND_URL}/api`;
+import { getContent } from '../lib/content';
 
 const Hero = () => {
   const [profileData, setProfileData] = useState(null);
@@ -13,8 +10,8 @@ const Hero = () => {
   useEffect(() => {
     const fetchProfile = async () => {
       try {
-        const response = await axios.get(`${API}/profile`);
-        setProfileData(response.data);
+        const data = await getContent('profile');
+        setProfileData(data);
       } catch (error) {
         console.error('Error fetching profile:', error);
       } finally {
@@ -3,10 +3,7 @@ import { Card, CardContent, CardHeader, CardTitle } from './ui/card';
 import { Badge } from './ui/badge';
 import { Button } from './ui/button';
 import { ExternalLink, TrendingUp, Shield, Users, Award, Palette } from 'lucide-react';
-import axios from 'axios';
-
-const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
-const API = `${BACKEND_URL}/api`;
+import { getContent } from '../lib/content';
 
 const Projects = () => {
   const [projects, setProjects] = useState([]);
@@ -16,12 +13,12 @@ const Projects = () => {
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const [projectsResponse, testimonialsResponse] = await Promise.all([
-          axios.get(`${API}/projects`),
-          axios.get(`${API}/testimonials`)
+        const [projectsData, testimonialsData] = await Promise.all([
+          getContent('projects'),
+          getContent('testimonials')
         ]);
-        setProjects(projectsResponse.data);
-        setTestimonials(testimonialsResponse.data);
+        setProjects(projectsData);
+        setTestimonials(testimonialsData);
       } catch (error) {
         console.error('Error fetching data:', error);
       } finally {
@@ -2,10 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Card, CardContent, CardHeader, CardTitle } from './ui/card';
 import { Progress } from './ui/progress';
 import { Briefcase, Users, Calculator, Lightbulb, Monitor } from 'lucide-react';
-import axios from 'axios';
-
-const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
-const API = `${BACKEND_URL}/api`;
+import { getContent } from '../lib/content';
 
 const Skills = () => {
   const [skills, setSkills] = useState([]);
@@ -14,8 +11,8 @@ const Skills = () => {
   useEffect(() => {
     const fetchSkills = async () => {
       try {
-        const response = await axios.get(`${API}/skills`);
-        setSkills(response.data);
+        const data = await getContent('skills');
+        setSkills(data);
       } catch (error) {
         console.error('Error fetching skills:', error);
       } finally {
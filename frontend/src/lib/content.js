@@ -0,0 +1,37 @@
+import axios from 'axios';
+
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const API = `${BACKEND_URL}/api`;
+// Tenant whose static export this site serves; set it empty to always read the API
+const TENANT = process.env.REACT_APP_CONTENT_TENANT ?? 'default';
+const CONTENT = `/content/${TENANT}`;
+
+let manifest;
+
+// The manifest written by backend/export.py at build time, or null when none shipped
+const loadManifest = () => {
+  if (manifest === undefined) {
+    manifest = TENANT
+      ? axios.get(`${CONTENT}/manifest.json`)
+          .then((response) => (response.data && response.data.sections ? response.data : null))
+          .catch(() => null)
+      : Promise.resolve(null);
+  }
+  return manifest;
+};
+
+// A content section, from the static export when it has one, otherwise from the API
+export async function getContent(section) {
+  const current = await loadManifest();
+  const entry = current && current.sections[section];
+  if (entry) {
+    try {
+      const response = await axios.get(`${CONTENT}/${entry.file}`);
+      return response.data;
+    } catch (error) {
+      console.error(`Error fetching exported ${section}, falling back to the API:`, error);
+    }
+  }
+  const response = await axios.get(`${API}/${section}`);
+  return response.data;
+}